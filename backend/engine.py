@@ -9,6 +9,7 @@ import math
 import requests
 from scenario_generator_client import ScenarioGeneratorClient, ScenarioDTO, VehicleDTO
 from scenario_runner_client import ScenarioRunnerClient
+import solver_wire
 from database.repositories import ScenarioRepository, VehicleRepository, CustomerRepository, AssignmentRepository
 from models.scenario import Scenario
 from models.vehicle import Vehicle, VehicleRouteStatus
@@ -16,7 +17,6 @@ from models.customer import Customer
 from models.assignment import Assignment, AssignmentStatus
 from models.base import ScenarioStatus
 from sqlalchemy.orm import Session
-from dataclasses import asdict
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -356,16 +356,26 @@ class ScenarioEngine:
 
 
     def call_solver(self, scenario:ScenarioDTO):
-        request_body = {
-            "id": str(scenario.id),
-            "startTime": str(scenario.startTime),
-            "endTime": str(scenario.endTime),
-            "status": scenario.status,
-            "vehicles": [asdict(v) for v in scenario.vehicles] if scenario.vehicles else None,
-            "customers": [asdict(c) for c in scenario.customers] if scenario.customers else None
-        }
-        response = requests.post('http://localhost:5000/solve', json=request_body)
-        return response.json()
+        # The scenario goes to the solver in its columnar format, which is much
+        # cheaper to encode and parse than JSON for large scenarios.
+        request_body = solver_wire.encode_scenario(
+            scenario,
+            id=str(scenario.id),
+            startTime=str(scenario.startTime),
+            endTime=str(scenario.endTime),
+            status=scenario.status
+        )
+        response = requests.post(
+            'http://localhost:5000/solve',
+            data=request_body,
+            headers={"Content-Type": solver_wire.CONTENT_TYPE}
+        )
+        response.raise_for_status()
+        return solver_wire.decode_solution(
+            response.content,
+            vehicle_ids=[str(v.id) for v in scenario.vehicles or []],
+            customer_ids=[str(c.id) for c in scenario.customers or []]
+        )
 
 
     
\ No newline at end of file
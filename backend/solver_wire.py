@@ -0,0 +1,98 @@
+import json
+import struct
+import sys
+from array import array
+from typing import Any, Dict, List, Tuple
+
+from scenario_generator_client import ScenarioDTO
+
+# Columnar binary format of the solver, see solver/wire.py for the layout.
+CONTENT_TYPE = "application/vnd.robotaxi.columnar"
+MAGIC = b"RTC1"
+ALIGNMENT = 8
+
+
+def _float_column(values) -> bytes:
+    column = array("d", values)
+    if sys.byteorder == "big":
+        column.byteswap()
+    return column.tobytes()
+
+
+def _id_column(ids: List[str]) -> bytes:
+    return "\n".join(ids).encode()
+
+
+def encode_scenario(scenario: ScenarioDTO, **params) -> bytes:
+    """
+    Encode the vehicles and customers of a scenario as a columnar /solve request.
+
+    Args:
+        scenario: The scenario to solve
+        params: Further fields of the request, e.g. max_seconds
+
+    Returns:
+        bytes: The request body, to send with CONTENT_TYPE
+    """
+    vehicles, customers = scenario.vehicles or [], scenario.customers or []
+    columns: List[Tuple[str, str, bytes]] = [
+        ("vehicles.id", "utf-8", _id_column([str(v.id) for v in vehicles])),
+        ("vehicles.coordX", "<f8", _float_column(v.coordX for v in vehicles)),
+        ("vehicles.coordY", "<f8", _float_column(v.coordY for v in vehicles)),
+        ("customers.id", "utf-8", _id_column([str(c.id) for c in customers])),
+        ("customers.coordX", "<f8", _float_column(c.coordX for c in customers)),
+        ("customers.coordY", "<f8", _float_column(c.coordY for c in customers)),
+        ("customers.destinationX", "<f8", _float_column(c.destinationX for c in customers)),
+        ("customers.destinationY", "<f8", _float_column(c.destinationY for c in customers)),
+    ]
+    header = json.dumps({
+        **params,
+        "columns": [[name, dtype, len(data)] for name, dtype, data in columns]
+    }).encode()
+
+    frame = [MAGIC, struct.pack("<I", len(header)), header]
+    offset = len(MAGIC) + 4 + len(header)
+    for _, _, data in columns:
+        padding = -offset % ALIGNMENT
+        frame += [b"\0" * padding, data]
+        offset += padding + len(data)
+    return b"".join(frame)
+
+
+def decode_solution(body: bytes, vehicle_ids: List[str], customer_ids: List[str]) -> Dict[str, Any]:
+    """
+    Decode a columnar /solve response into the same dictionary as the JSON one.
+
+    Args:
+        body: The response body
+        vehicle_ids: The vehicle ids, in the order of the request
+        customer_ids: The customer ids, in the order of the request
+
+    Returns:
+        dict: The response, with the allocations as {vehicle_id: [customer_id, ...]}
+    """
+    if body[:len(MAGIC)] != MAGIC:
+        raise ValueError("not a columnar solver response")
+    (header_length,) = struct.unpack_from("<I", body, len(MAGIC))
+    offset = len(MAGIC) + 4 + header_length
+    header = json.loads(body[len(MAGIC) + 4:offset])
+
+    # The allocations are the only columns of a response, as int32 indices.
+    columns = {}
+    for name, dtype, nbytes in header.pop("columns"):
+        offset += -offset % ALIGNMENT
+        columns[name] = struct.unpack_from(f"<{nbytes // 4}i", body, offset)
+        offset += nbytes
+
+    for entry in header.values():
+        if not isinstance(entry, dict) or "allocation" not in entry:
+            continue
+        allocation: Dict[str, List[str]] = {}
+        pairs = zip(
+            columns[entry["allocation"]["vehicles"]],
+            columns[entry["allocation"]["customers"]]
+        )
+        for vehicle, customer in pairs:
+            allocation.setdefault(vehicle_ids[vehicle], []).append(customer_ids[customer])
+        entry["allocation"] = allocation
+    return header
@@ -0,0 +1,52 @@
+"""Files of the on-disk caches, deleted least recently used first.
+
+Each entry of a cache is a file of its directory. Reading an entry touches its
+file, so the modification times order the files for the eviction.
+"""
+
+import os
+import tempfile
+from collections.abc import Callable
+from pathlib import Path
+from typing import BinaryIO
+
+
+def write_file(path: Path, write: Callable[[BinaryIO], None]) -> None:
+    """Write the file at ``path`` with ``write(file)``, atomically.
+
+    The content goes to a temporary file first, which then replaces ``path``, so
+    a crash never leaves a partial file, and other processes never read one.
+    """
+    with tempfile.NamedTemporaryFile(
+        dir=path.parent, suffix=".tmp", delete=False
+    ) as file:
+        try:
+            write(file)
+        except BaseException:
+            file.close()
+            Path(file.name).unlink(missing_ok=True)
+            raise
+    Path(file.name).replace(path)
+
+
+def cache_files(directory: Path, pattern: str) -> list[tuple[Path, os.stat_result]]:
+    """Return the files of ``directory`` matching ``pattern``, with their stats."""
+    files = []
+    for file in directory.glob(pattern):
+        try:
+            files.append((file, file.stat()))
+        except FileNotFoundError:
+            # Deleted by another process meanwhile.
+            continue
+    return files
+
+
+def evict(directory: Path, pattern: str, max_bytes: int) -> None:
+    """Delete the least recently used files until they take ``max_bytes`` at most."""
+    files = cache_files(directory, pattern)
+    size = sum(stat.st_size for _, stat in files)
+    for file, stat in sorted(files, key=lambda item: item[1].st_mtime):
+        if size <= max_bytes:
+            break
+        file.unlink(missing_ok=True)
+        size -= stat.st_size
@@ -0,0 +1,297 @@
+"""Geographic decomposition of large scenarios.
+
+The customers are clustered with k-means on their pickup positions and every
+vehicle joins the cluster of its nearest centroid. Each cluster is then solved
+by the genetic algorithm on its own, in a pool of processes, so the distance
+tables and the search only grow with the size of the clusters. The allocations
+of the clusters are stitched together and repaired across the cluster
+boundaries.
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+import numpy as np
+
+from .genetic import solution as genetic_solution
+from .genetic.parallel import process_context
+from .greedy.grid import VehicleGrid, project
+
+sys.path.insert(0, str(Path(__file__).parent))
+from models import Records, assignment_cost, coordinates, ids
+
+# Maximum number of iterations of k-means.
+KMEANS_ITERATIONS: int = 50
+
+# Seconds between checks of the cancel event while the clusters are solved.
+CANCEL_POLL_SECONDS: float = 0.1
+
+# Event set to stop the clusters running in a worker process, see _init_worker.
+_worker_stop_event = None
+
+
+def _init_worker(stop_event) -> None:
+    global _worker_stop_event
+    _worker_stop_event = stop_event
+
+
+def _nearest_centroid(points: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    offsets = points[:, np.newaxis, :] - centroids[np.newaxis, :, :]
+    return np.einsum("ijk,ijk->ij", offsets, offsets).argmin(axis=1)
+
+
+def kmeans(
+    points: np.ndarray,
+    k: int,
+    rng: np.random.Generator,
+    iterations: int = KMEANS_ITERATIONS,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Cluster points with Lloyd's algorithm, vectorized over all the points.
+
+    The centroids start at ``k`` distinct random points, ``k`` being capped at
+    the number of points. Returns the centroids and the cluster of each point.
+    """
+    k = min(k, len(points))
+    centroids = points[rng.choice(len(points), k, replace=False)]
+    labels = _nearest_centroid(points, centroids)
+    for _ in range(iterations):
+        counts = np.bincount(labels, minlength=k)
+        sums = np.column_stack(
+            [np.bincount(labels, points[:, i], minlength=k) for i in range(2)]
+        )
+        # A centroid that lost all its points stays where it is.
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, np.newaxis]
+        new_labels = _nearest_centroid(points, centroids)
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+    return centroids, labels
+
+
+def decompose(
+    vehicle_points: np.ndarray,
+    customer_points: np.ndarray,
+    n_clusters: int,
+    rng: np.random.Generator,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Return the cluster of each vehicle and each customer.
+
+    The customers of a cluster that got no vehicle move to the nearest cluster
+    with vehicles, so every customer can be served within its cluster.
+    """
+    centroids, customer_labels = kmeans(customer_points, n_clusters, rng)
+    vehicle_labels = _nearest_centroid(vehicle_points, centroids)
+    staffed = np.flatnonzero(np.bincount(vehicle_labels, minlength=len(centroids)))
+    unstaffed = ~np.isin(customer_labels, staffed)
+    customer_labels[unstaffed] = staffed[
+        _nearest_centroid(customer_points[unstaffed], centroids[staffed])
+    ]
+    return vehicle_labels, customer_labels
+
+
+def repair(
+    vehicle_points: np.ndarray,
+    customer_points: np.ndarray,
+    vehicle_labels: np.ndarray,
+    customer_labels: np.ndarray,
+    assignment: np.ndarray,
+) -> np.ndarray:
+    """Move customers to a closer vehicle of another cluster.
+
+    Near a boundary, the nearest vehicle of a customer may belong to the
+    neighbouring cluster, which the solve of its own cluster could not use.
+    Such customers are reassigned to that vehicle, in place. Returns the mask
+    of the reassigned customers.
+    """
+    nearest, distances = VehicleGrid(vehicle_points).k_nearest(customer_points, 1)
+    nearest, distances = nearest[:, 0], distances[:, 0]
+    offsets = vehicle_points[assignment] - customer_points
+    assigned_distances = np.sqrt(np.einsum("ij,ij->i", offsets, offsets))
+    moved = (vehicle_labels[nearest] != customer_labels) & (
+        distances < assigned_distances
+    )
+    assignment[moved] = nearest[moved]
+    return moved
+
+
+def _take(items: list[dict], indices: np.ndarray) -> list[dict]:
+    if isinstance(items, Records):
+        return items.take(indices)
+    return [items[i] for i in indices.tolist()]
+
+
+def _solve_cluster(
+    vehicles, customers, max_seconds: float | None, deadline: float | None, **kwargs
+):
+    """Solve a cluster with the genetic algorithm, in ``max_seconds`` at most.
+
+    The run also stops at the ``deadline``, a time.time() timestamp shared by
+    the clusters however long they waited for a worker, and once the stop event
+    of the worker is set.
+    """
+    if deadline is not None:
+        kwargs["max_seconds"] = max(0.0, min(max_seconds, deadline - time.time()))
+    return genetic_solution.solve(
+        vehicles, customers, cancel_event=_worker_stop_event, **kwargs
+    )
+
+
+def _assign(
+    assignment: np.ndarray,
+    allocation: list[tuple[str, str]],
+    vehicle_ids: list[str],
+    customer_ids: list[str],
+    cluster_vehicles: np.ndarray,
+    cluster_customers: np.ndarray,
+) -> None:
+    """Copy the allocation of a cluster, with real ids, into the assignment."""
+    vehicle_indices = {vehicle_ids[v]: v for v in cluster_vehicles.tolist()}
+    customer_indices = {customer_ids[c]: c for c in cluster_customers.tolist()}
+    for vehicle_id, customer_id in allocation:
+        assignment[customer_indices[customer_id]] = vehicle_indices[vehicle_id]
+
+
+def solve(
+    vehicles: list[dict],
+    customers: list[dict],
+    n_clusters: int,
+    n_workers: int | None = None,
+    random_seed: int = genetic_solution.RANDOM_SEED,
+    max_seconds: float | None = None,
+    cancel_event: threading.Event | None = None,
+    **kwargs,
+) -> tuple[list[tuple[str, str]], tuple[float, float], dict]:
+    """Solve a taxi commission by solving ``n_clusters`` parts of it in parallel.
+
+    Each cluster is solved with genetic.solution.solve() and ``kwargs``, in a
+    pool of ``n_workers`` processes (by default, one per CPU). ``max_seconds``
+    is the time budget of all the clusters together: it is shared equally by
+    the clusters each worker solves, and those which start late only get the
+    time left. Once
+    ``cancel_event`` is set, the clusters which are not solved yet are given up:
+    the running ones stop at their next generation, and the customers of both
+    get their nearest vehicle.
+
+    Returns the allocation with the real ids, its total distance and waiting
+    time, and a dictionary with the ``clusters``, each with its number of
+    vehicles and customers and the information returned by the genetic
+    algorithm, the number of customers ``repaired``, i.e., moved by the repair
+    pass, and the most common ``termination_reason`` and the largest number of
+    ``generations`` of the clusters.
+    """
+    if customers and not vehicles:
+        raise ValueError("there must be at least one vehicle.")
+    if not customers:
+        info = {
+            "clusters": [],
+            "repaired": 0,
+            "termination_reason": None,
+            "generations": 0,
+        }
+        return [], (0.0, 0.0), info
+
+    vehicle_ids, customer_ids = ids(vehicles), ids(customers)
+    vehicle_coords = coordinates(vehicles)
+    customer_coords = coordinates(customers)
+    reference_latitude = vehicle_coords[:, 0].mean()
+    vehicle_points = project(vehicle_coords, reference_latitude)
+    customer_points = project(customer_coords, reference_latitude)
+    vehicle_labels, customer_labels = decompose(
+        vehicle_points, customer_points, n_clusters, np.random.default_rng(random_seed)
+    )
+    clusters = [
+        (
+            np.flatnonzero(vehicle_labels == label),
+            np.flatnonzero(customer_labels == label),
+        )
+        for label in np.unique(customer_labels)
+    ]
+
+    n_workers = n_workers or os.cpu_count() or 1
+    cluster_seconds = deadline = None
+    if max_seconds is not None:
+        cluster_seconds = max_seconds * min(n_workers, len(clusters)) / len(clusters)
+        deadline = time.time() + max_seconds
+    # The customers of the clusters which are not solved are left at -1.
+    assignment = np.full(len(customers), -1, dtype=np.intp)
+    cluster_infos = [{"termination_reason": "cancelled"}] * len(clusters)
+    context = process_context()
+    stop_event = context.Event()
+    pool = ProcessPoolExecutor(
+        n_workers,
+        mp_context=context,
+        initializer=_init_worker,
+        initargs=(stop_event,),
+    )
+    try:
+        futures = {
+            pool.submit(
+                _solve_cluster,
+                _take(vehicles, cluster_vehicles),
+                _take(customers, cluster_customers),
+                cluster_seconds,
+                deadline,
+                **kwargs,
+            ): i
+            for i, (cluster_vehicles, cluster_customers) in enumerate(clusters)
+        }
+        pending = set(futures)
+        while pending and not (cancel_event is not None and cancel_event.is_set()):
+            done, pending = wait(
+                pending, timeout=CANCEL_POLL_SECONDS, return_when=FIRST_COMPLETED
+            )
+            for future in done:
+                i = futures[future]
+                allocation, _, cluster_infos[i] = future.result()
+                _assign(assignment, allocation, vehicle_ids, customer_ids, *clusters[i])
+    finally:
+        # Running clusters stop at their next generation, and their results are
+        # dropped.
+        stop_event.set()
+        pool.shutdown(wait=True, cancel_futures=True)
+
+    unsolved = assignment < 0
+    if unsolved.any():
+        nearest, _ = VehicleGrid(vehicle_points).k_nearest(customer_points[unsolved], 1)
+        assignment[unsolved] = nearest[:, 0]
+    repaired = repair(
+        vehicle_points, customer_points, vehicle_labels, customer_labels, assignment
+    )
+
+    solution = [
+        (vehicle_ids[vehicle], customer_id)
+        for vehicle, customer_id in zip(assignment.tolist(), customer_ids)
+    ]
+    fitness_values = assignment_cost(
+        vehicle_coords,
+        customer_coords,
+        coordinates(customers, "destinationX", "destinationY"),
+        assignment,
+    )
+    reasons = Counter(
+        cluster_info["termination_reason"] for cluster_info in cluster_infos
+    )
+    info = {
+        "clusters": [
+            {
+                "vehicles": len(cluster_vehicles),
+                "customers": len(cluster_customers),
+                **cluster_info,
+            }
+            for (cluster_vehicles, cluster_customers), cluster_info in zip(
+                clusters, cluster_infos
+            )
+        ],
+        "repaired": int(repaired.sum()),
+        "termination_reason": reasons.most_common(1)[0][0],
+        "generations": max(
+            cluster_info.get("generations", 0) for cluster_info in cluster_infos
+        ),
+    }
+    return solution, fitness_values, info
@@ -0,0 +1,125 @@
+"""Disk cache of distance tables, keyed by the coordinates they are computed from.
+
+The fleets and their start positions repeat from scenario to scenario, while the
+customers come and go. The tables are therefore stored as tiles of columns, one
+``.npy`` file per tile, keyed by the rows of the table, i.e., the fleet, and the
+columns of the tile, i.e., a run of customers. The tiles end after the customers
+whose coordinates hash to a multiple of TILE_COLUMNS, so adding or removing a
+customer only changes its own tile, and a scenario with one more customer, or a
+known fleet with new customers, reuses all the other tiles.
+
+The tiles are opened as read-only memory maps: the solver processes sharing the
+directory also share one copy of each tile in the page cache. A table of a
+single tile is returned as that memory map, larger ones are assembled in memory.
+"""
+
+import hashlib
+import os
+import sys
+from collections.abc import Callable
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent))
+from cache_files import cache_files, evict, write_file
+
+# Average number of columns per tile.
+TILE_COLUMNS: int = 1024
+
+# Tiles are cut after this many columns anyway, e.g., for repeated customers.
+MAX_TILE_COLUMNS: int = 8 * TILE_COLUMNS
+
+
+def _column_hashes(columns: np.ndarray) -> np.ndarray:
+    """Hash the coordinates of each column, cheaply and stably across processes."""
+    bits = np.ascontiguousarray(columns, "<f8").view("<u8").reshape(columns.shape)
+    hashes = np.zeros(len(columns), dtype=np.uint64)
+    for column in bits.T:
+        # Multiply-xorshift mixing, which wraps around on overflow.
+        hashes = (hashes ^ column) * np.uint64(0x9E3779B97F4A7C15)
+        hashes ^= hashes >> np.uint64(29)
+    return hashes
+
+
+def tile_bounds(columns: np.ndarray) -> list[tuple[int, int]]:
+    """Return the ``(start, stop)`` column ranges of the tiles of a table."""
+    cuts = np.flatnonzero(_column_hashes(columns) % np.uint64(TILE_COLUMNS) == 0) + 1
+    bounds, start = [], 0
+    for cut in [*cuts.tolist(), len(columns)]:
+        while cut - start > MAX_TILE_COLUMNS:
+            bounds.append((start, start + MAX_TILE_COLUMNS))
+            start += MAX_TILE_COLUMNS
+        if cut > start:
+            bounds.append((start, cut))
+            start = cut
+    return bounds
+
+
+class DistanceCache:
+    """Directory of distance table tiles, deleted least recently used first.
+
+    The files are deleted once they take more than ``max_bytes``; tiles larger
+    than that are not stored at all. The cache only holds its settings, so it
+    can be sent to other processes, e.g., the workers of decomposition.solve().
+    """
+
+    def __init__(self, directory: str | Path, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def get(
+        self,
+        name: str,
+        rows: np.ndarray | None,
+        columns: np.ndarray,
+        compute: Callable[[slice], np.ndarray],
+    ) -> np.ndarray:
+        """Return the ``name`` table of the ``rows`` and ``columns`` coordinates.
+
+        ``columns`` holds the coordinates of each column of the table, and
+        ``rows`` those the whole table depends on, if any. The tiles which are
+        not stored yet are computed with ``compute(columns_slice)``, which returns
+        the table for those columns only, along its last axis.
+        """
+        hasher = hashlib.sha256(name.encode())
+        if rows is not None:
+            self._hash(hasher, rows)
+        tiles, written = [], False
+        for start, stop in tile_bounds(columns):
+            tile_hasher = hasher.copy()
+            self._hash(tile_hasher, columns[start:stop])
+            path = self.directory / f"{tile_hasher.hexdigest()}.npy"
+            try:
+                # The modification time orders the files for the eviction.
+                os.utime(path)
+                tiles.append(np.asarray(np.load(path, mmap_mode="r")))
+                continue
+            except FileNotFoundError:
+                pass
+            tile = compute(slice(start, stop))
+            if tile.nbytes <= self.max_bytes:
+                write_file(path, lambda file: np.save(file, tile))
+                written = True
+            tiles.append(tile)
+        if written:
+            evict(self.directory, "*.npy", self.max_bytes)
+        if len(tiles) == 1:
+            return tiles[0]
+        if not tiles:
+            return compute(slice(0, 0))
+        return np.concatenate(tiles, axis=-1)
+
+    def stats(self) -> dict:
+        files = cache_files(self.directory, "*.npy")
+        return {
+            "entries": len(files),
+            "bytes": sum(stat.st_size for _, stat in files),
+            "max_bytes": self.max_bytes,
+        }
+
+    @staticmethod
+    def _hash(hasher, array: np.ndarray) -> None:
+        hasher.update(repr(array.shape).encode())
+        hasher.update(np.ascontiguousarray(array, "<f8").tobytes())
@@ -0,0 +1,274 @@
+"""Island model for the genetic algorithm.
+
+Each island evolves its own ArrayPopulation in a separate process, reading the
+distance tables from shared memory. Every ``migration_interval`` generations the
+islands send copies of their best individuals to the next island of a ring,
+where they replace the worst individuals.
+"""
+
+import sys
+from functools import partial
+from pathlib import Path
+
+import numpy as np
+
+from .parallel import attach_tables, process_context, share_tables
+from .population import ArrayPopulation, make_toolbox, rank
+from .reporting import SampledLogbook
+from .utils import PhaseProfile, Progress, Termination, _record, ea_array_with_elitism
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from models import Scenario, evaluate_gene_costs, evaluate_genes, k_nearest_vehicles
+
+
+def _immigrate(population: ArrayPopulation, migrants: ArrayPopulation, weights) -> None:
+    """Replace the worst individuals of the population with the migrants."""
+    worst = np.argsort(rank(population.fitness, weights))[: len(migrants)]
+    population.vehicles[worst] = migrants.vehicles
+    population.customers[worst] = migrants.customers
+    population.fitness[worst] = migrants.fitness
+    if population.gene_costs is not None:
+        population.gene_costs[worst] = migrants.gene_costs
+
+
+def _island(
+    connection,
+    table_specs,
+    random_seed: int,
+    weights: tuple[float, float],
+    population_size: int,
+    p_crossover: float,
+    p_mutation: float,
+    hall_of_fame_size: int,
+    incremental_evaluation: bool,
+    seed_fraction: float,
+    seed_vehicles: np.ndarray,
+    neighbourhood_size: int | None,
+    profile: bool,
+    profile_generations: bool,
+):
+    """Evolve one island, one epoch per message received from the coordinator.
+
+    Each message is a ``(ngen, max_seconds, migrants)`` tuple; the island answers
+    with its hall of fame, the logbook of the epoch, and its PhaseProfile if
+    ``profile`` is set, per generation too with ``profile_generations``. ``None``
+    stops the island.
+    """
+    memories, tables = attach_tables(table_specs)
+    try:
+        num_taxis, num_customers = tables[0].shape
+        rng = np.random.default_rng(random_seed)
+        toolbox = make_toolbox(
+            rng,
+            partial(evaluate_genes, *tables),
+            weights,
+            num_taxis,
+            num_customers,
+            evaluate_gene_costs=(
+                partial(evaluate_gene_costs, *tables)
+                if incremental_evaluation
+                else None
+            ),
+            nearest_vehicles=seed_vehicles,
+            seed_fraction=seed_fraction,
+            candidate_vehicles=(
+                k_nearest_vehicles(tables[0], neighbourhood_size)
+                if neighbourhood_size is not None
+                else None
+            ),
+        )
+        population = toolbox.population(n=population_size)
+        while (message := connection.recv()) is not None:
+            ngen, max_seconds, migrants = message
+            if migrants is not None:
+                _immigrate(population, migrants, weights)
+            epoch_profile = None
+            if profile:
+                # An epoch is short, so its profile records every generation.
+                epoch_profile = PhaseProfile(1 if profile_generations else None)
+            population, halloffame, logbook = ea_array_with_elitism(
+                population,
+                toolbox,
+                cxpb=p_crossover,
+                mutpb=p_mutation,
+                ngen=ngen,
+                weights=weights,
+                hall_of_fame_size=hall_of_fame_size,
+                termination=Termination(ngen, max_seconds=max_seconds),
+                tracer=epoch_profile,
+            )
+            connection.send((halloffame, logbook, epoch_profile))
+    finally:
+        for memory in memories:
+            memory.close()
+
+
+def _receive(connection, island, index: int):
+    """Receive the answer of an island, raising a RuntimeError if it died."""
+    try:
+        return connection.recv()
+    except (EOFError, ConnectionResetError) as error:
+        # The pipe closes before the process is reaped; wait for its exit code.
+        island.join(timeout=1)
+        raise RuntimeError(
+            f"island {index} died (exit code {island.exitcode})."
+        ) from error
+
+
+def _merge_statistics(records: list[dict]) -> dict:
+    """Merge the statistics of one generation across all the islands."""
+    return {
+        "avg": np.mean([record["avg"] for record in records], axis=0),
+        "min": np.min([record["min"] for record in records], axis=0),
+        "max": np.max([record["max"] for record in records], axis=0),
+    }
+
+
+def _best(halls_of_fame: list[ArrayPopulation], weights) -> tuple[list, tuple]:
+    """Return the best individual across the halls of fame, and its fitness."""
+    best = halls_of_fame[0]
+    for hof in halls_of_fame[1:]:
+        best = best.concatenate(hof)
+    index = int(np.argmax(rank(best.fitness, weights)))
+    return best.individual(index), tuple(best.fitness[index].tolist())
+
+
+def evolve_islands(
+    scenario: Scenario,
+    weights: tuple[float, float],
+    n_islands: int,
+    migration_interval: int,
+    migration_size: int,
+    population_size: int,
+    p_crossover: float,
+    p_mutation: float,
+    termination: Termination,
+    hall_of_fame_size: int,
+    incremental_evaluation: bool,
+    seed_fraction: float,
+    seed_vehicles: np.ndarray,
+    neighbourhood_size: int | None,
+    random_seed: int,
+    logbook: SampledLogbook | None = None,
+    verbose: bool = False,
+    progress: Progress | None = None,
+    profile: PhaseProfile | None = None,
+):
+    """Run the GA on ``n_islands`` populations, one process each.
+
+    Returns the best individual across the halls of fame of all the islands, its
+    fitness values, and the SampledLogbook with the statistics of all the islands
+    merged (by default, a new one that records every generation).
+    The termination criteria are checked after every epoch, while the wall-clock
+    budget is also enforced within the epochs. The best individual is reported
+    to the optional Progress after every epoch. The phases of all the islands
+    are added up in the optional PhaseProfile.
+    """
+    if migration_interval < 1:
+        raise ValueError("the migration interval must be at least one generation.")
+
+    memories, table_specs = share_tables(scenario)
+    context = process_context()
+    connections, islands = [], []
+    try:
+        for i in range(n_islands):
+            parent_connection, child_connection = context.Pipe()
+            island = context.Process(
+                target=_island,
+                args=(
+                    child_connection,
+                    table_specs,
+                    random_seed + i,
+                    weights,
+                    population_size,
+                    p_crossover,
+                    p_mutation,
+                    hall_of_fame_size,
+                    incremental_evaluation,
+                    seed_fraction,
+                    seed_vehicles,
+                    neighbourhood_size,
+                    profile is not None,
+                    profile is not None and profile.interval is not None,
+                ),
+                daemon=True,
+            )
+            island.start()
+            # Only the island holds the other end, so its death ends the pipe.
+            child_connection.close()
+            connections.append(parent_connection)
+            islands.append(island)
+
+        if logbook is None:
+            logbook = SampledLogbook()
+        migrants = [None] * n_islands
+        halls_of_fame = []
+        generations_done = 0
+        while True:
+            ngen = min(
+                migration_interval, termination.max_generations - generations_done
+            )
+            max_seconds = None
+            if termination.max_seconds is not None:
+                max_seconds = termination.max_seconds - termination.elapsed_seconds
+            for connection, island_migrants in zip(connections, migrants):
+                connection.send((ngen, max_seconds, island_migrants))
+            halls_of_fame, logbooks, profiles = zip(
+                *(
+                    _receive(connection, island, i)
+                    for i, (connection, island) in enumerate(zip(connections, islands))
+                )
+            )
+
+            # The islands may stop early because of the time budget. The first
+            # record of every epoch but the first one repeats the last generation
+            # of the previous epoch.
+            ngen = min(len(lb) for lb in logbooks) - 1
+            for gen in range(0 if generations_done == 0 else 1, ngen + 1):
+                records = [lb[gen] for lb in logbooks]
+                _record(
+                    logbook,
+                    generations_done + gen,
+                    sum(record["nevals"] for record in records),
+                    partial(_merge_statistics, records),
+                    verbose,
+                )
+            if profile is not None:
+                for island_profile in profiles:
+                    profile.merge(island_profile, generations_done)
+            generations_done += ngen
+            if progress is not None and progress.due(generations_done):
+                progress.report(generations_done, *_best(halls_of_fame, weights))
+
+            best_wvalues = max(tuple(hof.fitness[0] * weights) for hof in halls_of_fame)
+            if termination.should_stop(generations_done, best_wvalues):
+                if not logbook.recorded(generations_done):
+                    _record(
+                        logbook,
+                        generations_done,
+                        0,
+                        partial(_merge_statistics, [lb[ngen] for lb in logbooks]),
+                        verbose,
+                        final=True,
+                    )
+                break
+
+            # Ring migration: each island receives the best of the previous one.
+            migrants = [
+                hof.take(np.arange(min(migration_size, len(hof))))
+                for hof in halls_of_fame[-1:] + halls_of_fame[:-1]
+            ]
+
+        for connection in connections:
+            connection.send(None)
+    finally:
+        for island in islands:
+            island.join(timeout=1)
+            if island.is_alive():
+                island.terminate()
+        for memory in memories:
+            memory.close()
+            memory.unlink()
+
+    # Take the best individual across all the islands as solution.
+    return *_best(halls_of_fame, weights), logbook
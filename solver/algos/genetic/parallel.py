@@ -0,0 +1,192 @@
+"""Parallel fitness evaluation on a pool of worker processes.
+
+The distance tables of the scenario are copied once into shared memory, and the
+workers attach to them when they start. The gene index arrays of the individuals
+to evaluate are copied into another shared block too, which the workers write
+the fitnesses to; each task only sends the name of the block and the rows of its
+chunk, so nothing of the size of the population is pickled.
+"""
+
+import multiprocessing
+import sys
+from multiprocessing.shared_memory import SharedMemory
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from models import Scenario, evaluate_genes, individuals_to_arrays
+
+# Modules imported by the forkserver, which the worker processes then inherit.
+FORKSERVER_PRELOAD = [
+    "numpy",
+    "deap.algorithms",
+    "deap.base",
+    "deap.creator",
+    "deap.tools",
+]
+
+# State of each worker process, set by _init_worker and _evaluate_chunk.
+_worker_memory: list[SharedMemory] = []
+_worker_tables: tuple[np.ndarray, np.ndarray] | None = None
+_worker_genes: tuple[str, SharedMemory, np.ndarray, np.ndarray] | None = None
+
+
+def process_context() -> multiprocessing.context.BaseContext:
+    """Return the multiprocessing context of the worker processes of the solver.
+
+    The solver runs in threads of the service, and a child forked from a
+    threaded process inherits the locks other threads held at that moment,
+    forever. The children are therefore forked from a clean forkserver process
+    where available, and spawned otherwise.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        # Import the libraries once in the forkserver, instead of in every child.
+        # The solver itself is not importable there, without its sys.path.
+        context.set_forkserver_preload(FORKSERVER_PRELOAD)
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+def share_tables(
+    scenario: Scenario,
+) -> tuple[list[SharedMemory], list[tuple[str, tuple[int, ...], str]]]:
+    """Copy the distance tables of a scenario into shared memory.
+
+    Returns the shared memory blocks, which the caller must close and unlink,
+    and the specs that other processes need to attach to them.
+    """
+    memories, table_specs = [], []
+    for table in (scenario.pickup_distances, scenario.trip_distances):
+        memory = SharedMemory(create=True, size=max(table.nbytes, 1))
+        np.ndarray(table.shape, dtype=table.dtype, buffer=memory.buf)[...] = table
+        memories.append(memory)
+        table_specs.append((memory.name, table.shape, table.dtype.str))
+    return memories, table_specs
+
+
+def attach_tables(
+    table_specs,
+) -> tuple[list[SharedMemory], tuple[np.ndarray, np.ndarray]]:
+    """Attach to distance tables shared with share_tables()."""
+    memories, tables = [], []
+    for name, shape, dtype in table_specs:
+        memory = SharedMemory(name=name)
+        memories.append(memory)
+        tables.append(np.ndarray(shape, dtype=dtype, buffer=memory.buf))
+    return memories, tuple(tables)
+
+
+def _init_worker(table_specs):
+    """Attach the worker to the shared distance tables."""
+    global _worker_tables
+    memories, _worker_tables = attach_tables(table_specs)
+    _worker_memory.extend(memories)
+
+
+def _gene_arrays(buffer, n_rows: int, n_genes: int) -> tuple[np.ndarray, np.ndarray]:
+    """Return the gene index and fitness arrays laid out in a shared block."""
+    genes = np.ndarray((2, n_rows, n_genes), dtype=np.int32, buffer=buffer)
+    fitness = np.ndarray(
+        (n_rows, 2), dtype=np.float64, buffer=buffer, offset=genes.nbytes
+    )
+    return genes, fitness
+
+
+def _evaluate_chunk(genes_spec, start: int, stop: int) -> None:
+    global _worker_genes
+    name, n_rows, n_genes = genes_spec
+    if _worker_genes is None or _worker_genes[0] != name:
+        # The evaluator moved the genes to a larger block.
+        if _worker_genes is not None:
+            _worker_genes[1].close()
+        memory = SharedMemory(name=name)
+        _worker_genes = (
+            name,
+            memory,
+            *_gene_arrays(memory.buf, n_rows, n_genes),
+        )
+    _, _, genes, fitness = _worker_genes
+    fitness[start:stop] = evaluate_genes(
+        *_worker_tables, genes[0, start:stop], genes[1, start:stop]
+    )
+
+
+class ParallelEvaluator:
+    """Evaluate a population in chunks on ``n_workers`` processes.
+
+    Calling the evaluator with 0-based vehicle and customer index arrays of shape
+    (n_individuals, n_genes) returns the (n_individuals, 2) fitness array, like
+    ``models.evaluate_genes``. The evaluator must be closed to release the pool
+    and the shared memory; it can also be used as a context manager.
+    """
+
+    def __init__(self, scenario: Scenario, n_workers: int):
+        self.n_workers = n_workers
+        self._memory, table_specs = share_tables(scenario)
+        self._genes_memory = None
+        self._genes_spec = None
+        self._pool = process_context().Pool(
+            n_workers, initializer=_init_worker, initargs=(table_specs,)
+        )
+
+    def __call__(self, vehicle_idx: np.ndarray, customer_idx: np.ndarray) -> np.ndarray:
+        n_rows, n_genes = vehicle_idx.shape
+        if n_rows == 0:
+            return np.empty((0, 2))
+        # The indices are copied as 32-bit integers, half the bytes of NumPy's.
+        genes, fitness = self._gene_arrays(n_rows, n_genes)
+        genes[0, :n_rows] = vehicle_idx
+        genes[1, :n_rows] = customer_idx
+        bounds = np.linspace(0, n_rows, min(self.n_workers, n_rows) + 1, dtype=int)
+        self._pool.starmap(
+            _evaluate_chunk,
+            [
+                (self._genes_spec, start, stop)
+                for start, stop in zip(bounds[:-1].tolist(), bounds[1:].tolist())
+            ],
+        )
+        return fitness[:n_rows].copy()
+
+    def evaluate_individuals(self, individuals: list[list[tuple[int, int]]]):
+        """Evaluate DEAP individuals, i.e., lists of 1-based genes."""
+        if not individuals:
+            return np.empty((0, 2))
+        return self(*individuals_to_arrays(individuals))
+
+    def _gene_arrays(self, n_rows: int, n_genes: int) -> tuple[np.ndarray, np.ndarray]:
+        """Return the shared gene index and fitness arrays, for at least ``n_rows``.
+
+        The block is only replaced when it is too small, i.e., usually once, for
+        the initial population.
+        """
+        spec = self._genes_spec
+        if spec is None or spec[1] < n_rows or spec[2] != n_genes:
+            if self._genes_memory is not None:
+                self._release_genes()
+            size = n_rows * (2 * n_genes * 4 + 2 * 8)
+            self._genes_memory = SharedMemory(create=True, size=size)
+            self._genes_spec = (self._genes_memory.name, n_rows, n_genes)
+        return _gene_arrays(self._genes_memory.buf, *self._genes_spec[1:])
+
+    def _release_genes(self):
+        self._genes_memory.close()
+        self._genes_memory.unlink()
+        self._genes_memory = None
+
+    def close(self):
+        self._pool.close()
+        self._pool.join()
+        if self._genes_memory is not None:
+            self._release_genes()
+        for memory in self._memory:
+            memory.close()
+            memory.unlink()
+        self._memory = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,344 @@
+"""Array-backed population for the genetic algorithm.
+
+Instead of DEAP lists of ``(vehicle, customer)`` tuples, the whole population is
+held in two integer arrays of shape ``(population_size, num_customers)``: the
+0-based vehicle assigned to each gene and the 0-based customer permutation. The
+genetic operators below work on all the individuals at once.
+
+Optionally, a population also tracks the distance and waiting time contributed
+by each gene in ``gene_costs``. Then the genetic operators only recompute the
+costs of the genes they change, and update the fitness by the difference.
+"""
+
+import numpy as np
+from deap import base
+
+# Probability that a seeded gene gets a random taxi instead of the nearest one.
+SEED_PERTURBATION = 0.1
+
+
+class ArrayPopulation:
+    """A population whose individuals are rows of NumPy arrays."""
+
+    def __init__(
+        self,
+        vehicles: np.ndarray,
+        customers: np.ndarray,
+        fitness: np.ndarray | None = None,
+        gene_costs: np.ndarray | None = None,
+    ):
+        self.vehicles = vehicles
+        self.customers = customers
+        if fitness is None:
+            fitness = np.full((len(vehicles), 2), np.nan)
+        self.fitness = fitness
+        self.gene_costs = gene_costs
+
+    def __len__(self) -> int:
+        return len(self.vehicles)
+
+    @property
+    def invalid(self) -> np.ndarray:
+        """Boolean mask of the individuals that need to be evaluated."""
+        return np.isnan(self.fitness[:, 0])
+
+    def take(self, indices: np.ndarray) -> "ArrayPopulation":
+        """Return a new population made of copies of the given rows."""
+        return ArrayPopulation(
+            self.vehicles[indices],
+            self.customers[indices],
+            self.fitness[indices],
+            None if self.gene_costs is None else self.gene_costs[indices],
+        )
+
+    def concatenate(self, other: "ArrayPopulation") -> "ArrayPopulation":
+        gene_costs = None
+        if self.gene_costs is not None and other.gene_costs is not None:
+            gene_costs = np.concatenate((self.gene_costs, other.gene_costs))
+        return ArrayPopulation(
+            np.concatenate((self.vehicles, other.vehicles)),
+            np.concatenate((self.customers, other.customers)),
+            np.concatenate((self.fitness, other.fitness)),
+            gene_costs,
+        )
+
+    def individual(self, index: int) -> list[tuple[int, int]]:
+        """Convert a row to the 1-based ``(vehicle, customer)`` gene format."""
+        return list(
+            zip(
+                (self.vehicles[index] + 1).tolist(),
+                (self.customers[index] + 1).tolist(),
+            )
+        )
+
+
+def random_population(
+    rng: np.random.Generator,
+    n: int,
+    num_taxis: int,
+    num_customers: int,
+    track_gene_costs: bool = False,
+) -> ArrayPopulation:
+    """Create ``n`` individuals with random taxis and customer orders."""
+    vehicles = rng.integers(0, num_taxis, size=(n, num_customers), dtype=np.intp)
+    customers = rng.permuted(
+        np.broadcast_to(np.arange(num_customers, dtype=np.intp), (n, num_customers)),
+        axis=1,
+    )
+    gene_costs = np.zeros((n, num_customers, 2)) if track_gene_costs else None
+    return ArrayPopulation(vehicles, customers, gene_costs=gene_costs)
+
+
+def seeded_population(
+    rng: np.random.Generator,
+    n: int,
+    nearest_vehicles: np.ndarray,
+    num_taxis: int,
+    perturbation: float,
+    track_gene_costs: bool = False,
+) -> ArrayPopulation:
+    """Create ``n`` individuals from the nearest-vehicle heuristic.
+
+    Each customer is served by its nearest taxi, except that, with probability
+    ``perturbation``, a random taxi is chosen instead. The first individual is
+    not perturbed.
+    """
+    population = random_population(
+        rng, n, num_taxis, len(nearest_vehicles), track_gene_costs
+    )
+    perturbed = rng.random(population.vehicles.shape) < perturbation
+    perturbed[:1] = False
+    population.vehicles = np.where(
+        perturbed, population.vehicles, nearest_vehicles[population.customers]
+    )
+    return population
+
+
+def initial_population(
+    rng: np.random.Generator,
+    n: int,
+    num_taxis: int,
+    num_customers: int,
+    track_gene_costs: bool = False,
+    nearest_vehicles: np.ndarray | None = None,
+    seed_fraction: float = 0.0,
+    perturbation: float = SEED_PERTURBATION,
+) -> ArrayPopulation:
+    """Create a random population where a ``seed_fraction`` of it is seeded."""
+    n_seeded = round(n * seed_fraction) if nearest_vehicles is not None else 0
+    population = random_population(
+        rng, n - n_seeded, num_taxis, num_customers, track_gene_costs
+    )
+    if n_seeded:
+        population = seeded_population(
+            rng, n_seeded, nearest_vehicles, num_taxis, perturbation, track_gene_costs
+        ).concatenate(population)
+    return population
+
+
+def rank(fitness: np.ndarray, weights: tuple[float, ...]) -> np.ndarray:
+    """Rank the individuals, the higher the better.
+
+    As in DEAP, the weighted fitness values are compared lexicographically.
+    """
+    weighted = fitness * np.asarray(weights)
+    # np.lexsort sorts by the last key first.
+    order = np.lexsort(weighted.T[::-1])
+    ranks = np.empty(len(fitness), dtype=np.intp)
+    ranks[order] = np.arange(len(fitness))
+    return ranks
+
+
+def sel_tournament(
+    rng: np.random.Generator,
+    population: ArrayPopulation,
+    k: int,
+    tournsize: int,
+    weights: tuple[float, ...],
+) -> np.ndarray:
+    """Select ``k`` individuals with tournaments, returning their indices."""
+    ranks = rank(population.fitness, weights)
+    aspirants = rng.integers(0, len(population), size=(k, tournsize))
+    winners = np.argmax(ranks[aspirants], axis=1)
+    return aspirants[np.arange(k), winners]
+
+
+def cx_two_point(
+    rng: np.random.Generator, vehicles: np.ndarray, cxpb: float
+) -> np.ndarray:
+    """Two-point crossover of the vehicles of consecutive pairs of individuals.
+
+    Only vehicles are exchanged, so every individual keeps its customer
+    permutation. The array is modified in-place; returns the row and column
+    indices of the genes that were changed.
+    """
+    n, size = vehicles.shape
+    if size < 2:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+    first = np.arange(0, n - 1, 2)
+    first = first[rng.random(len(first)) < cxpb]
+    # Same cut point distribution as deap.tools.cxTwoPoint.
+    cx1 = rng.integers(1, size + 1, size=len(first))
+    cx2 = rng.integers(1, size, size=len(first))
+    cx2 = np.where(cx2 >= cx1, cx2 + 1, cx2)
+    cx1, cx2 = np.minimum(cx1, cx2), np.maximum(cx1, cx2)
+    positions = np.arange(size)
+    segment = (positions >= cx1[:, np.newaxis]) & (positions < cx2[:, np.newaxis])
+    rows = np.broadcast_to(first[:, np.newaxis], segment.shape)[segment]
+    cols = np.broadcast_to(positions, segment.shape)[segment]
+    swapped = vehicles[rows, cols]
+    vehicles[rows, cols] = vehicles[rows + 1, cols]
+    vehicles[rows + 1, cols] = swapped
+    return np.concatenate((rows, rows + 1)), np.concatenate((cols, cols))
+
+
+def mut_shuffle_indexes(
+    rng: np.random.Generator,
+    vehicles: np.ndarray,
+    customers: np.ndarray,
+    mutpb: float,
+    indpb: float,
+) -> np.ndarray:
+    """Array counterpart of ``deap.tools.mutShuffleIndexes``: swap random genes.
+
+    Each individual is mutated with probability ``mutpb``, and then each of its
+    genes swaps places with another gene with probability ``indpb``. Whole genes
+    are swapped, i.e., both their vehicle and their customer, so the costs of
+    the individual do not change, but the next crossovers exchange other genes.
+    The arrays are modified in-place; returns the row and column indices of the
+    genes that were changed.
+    """
+    n, size = vehicles.shape
+    mutated = rng.random(n) < mutpb
+    if size < 2:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+    swap = (rng.random((n, size)) < indpb) & mutated[:, np.newaxis]
+    rows, cols = np.nonzero(swap)
+    partners = rng.integers(0, size - 1, size=len(cols))
+    partners = np.where(partners >= cols, partners + 1, partners)
+    # The pairs of one individual may overlap, so they are swapped one after the
+    # other, like in DEAP: the k-th swap of every individual in the k-th round.
+    order = np.arange(len(rows)) - np.searchsorted(rows, rows)
+    for k in range(order.max(initial=-1) + 1):
+        r, c, p = rows[order == k], cols[order == k], partners[order == k]
+        for genes in (vehicles, customers):
+            genes[r, c], genes[r, p] = genes[r, p], genes[r, c]
+    return np.concatenate((rows, rows)), np.concatenate((cols, partners))
+
+
+def mut_neighbourhood(
+    rng: np.random.Generator,
+    vehicles: np.ndarray,
+    customers: np.ndarray,
+    mutpb: float,
+    indpb: float,
+    candidates: np.ndarray,
+) -> np.ndarray:
+    """Reassign random genes to one of the nearest vehicles to their customer.
+
+    Each individual is mutated with probability ``mutpb``, and then each of its
+    genes gets, with probability ``indpb``, a random vehicle among the
+    ``candidates`` of its customer, i.e., the row of that customer in the
+    (n_customers, k) array of the k nearest vehicles. The array is modified
+    in-place; returns the row and column indices of the genes that were changed.
+    """
+    n, size = vehicles.shape
+    mutated = rng.random(n) < mutpb
+    reassign = (rng.random((n, size)) < indpb) & mutated[:, np.newaxis]
+    rows, cols = np.nonzero(reassign)
+    choices = rng.integers(0, candidates.shape[1], size=len(rows))
+    vehicles[rows, cols] = candidates[customers[rows, cols], choices]
+    return rows, cols
+
+
+def var_and(
+    population: ArrayPopulation, toolbox, cxpb: float, mutpb: float
+) -> ArrayPopulation:
+    """Array counterpart of ``deap.algorithms.varAnd``.
+
+    The offspring is a copy of the population to which crossover and mutation
+    are applied. The fitness of the modified individuals is invalidated or, if
+    the population tracks its gene costs, updated for the changed genes only.
+    Returns the offspring and the number of individuals modified.
+    """
+    offspring = population.take(np.arange(len(population)))
+    mated_rows, mated_cols = toolbox.mate(offspring.vehicles, cxpb)
+    mutated_rows, mutated_cols = toolbox.mutate(
+        offspring.vehicles, offspring.customers, mutpb
+    )
+
+    # A gene may have been changed by several operators.
+    size = offspring.vehicles.shape[1]
+    changed = np.unique(
+        np.concatenate((mated_rows, mutated_rows)) * size
+        + np.concatenate((mated_cols, mutated_cols))
+    )
+    rows, cols = np.divmod(changed, size)
+    if offspring.gene_costs is None:
+        offspring.fitness[rows] = np.nan
+    else:
+        new_costs = toolbox.evaluate_gene_costs(
+            offspring.vehicles[rows, cols], offspring.customers[rows, cols]
+        )
+        np.add.at(offspring.fitness, rows, new_costs - offspring.gene_costs[rows, cols])
+        offspring.gene_costs[rows, cols] = new_costs
+    return offspring, len(np.unique(rows))
+
+
+def make_toolbox(
+    rng: np.random.Generator,
+    evaluate_population,
+    weights: tuple[float, ...],
+    num_taxis: int,
+    num_customers: int,
+    evaluate_gene_costs=None,
+    nearest_vehicles: np.ndarray | None = None,
+    seed_fraction: float = 0.0,
+    seed_perturbation: float = SEED_PERTURBATION,
+    candidate_vehicles: np.ndarray | None = None,
+) -> base.Toolbox:
+    """Create the toolbox of the array-backed genetic algorithm.
+
+    ``evaluate_population`` takes 0-based vehicle and customer index arrays and
+    returns the fitness array, e.g., ``models.evaluate_genes`` bound to the
+    distance tables of a scenario. If ``evaluate_gene_costs`` is given, e.g.,
+    ``models.evaluate_gene_costs`` bound to the same tables, the populations
+    track their gene costs and are evaluated incrementally. With
+    ``nearest_vehicles``, a ``seed_fraction`` of the initial population comes
+    from the nearest-vehicle heuristic (see seeded_population()). With
+    ``candidate_vehicles``, the k nearest vehicles to each customer, mutation
+    reassigns genes within those (see mut_neighbourhood()) instead of swapping
+    random genes (see mut_shuffle_indexes()).
+    """
+    toolbox = base.Toolbox()
+    toolbox.register(
+        "population",
+        initial_population,
+        rng,
+        num_taxis=num_taxis,
+        num_customers=num_customers,
+        track_gene_costs=evaluate_gene_costs is not None,
+        nearest_vehicles=nearest_vehicles,
+        seed_fraction=seed_fraction,
+        perturbation=seed_perturbation,
+    )
+
+    # Register the evaluation functions.
+    toolbox.register("evaluate_population", evaluate_population)
+    if evaluate_gene_costs is not None:
+        toolbox.register("evaluate_gene_costs", evaluate_gene_costs)
+
+    # Register the genetic operators.
+    toolbox.register("mate", cx_two_point, rng)
+    if candidate_vehicles is not None:
+        toolbox.register(
+            "mutate",
+            mut_neighbourhood,
+            rng,
+            indpb=1.0 / num_customers,
+            candidates=candidate_vehicles,
+        )
+    else:
+        toolbox.register("mutate", mut_shuffle_indexes, rng, indpb=1.0 / num_customers)
+    toolbox.register("select", sel_tournament, rng, tournsize=3, weights=weights)
+    return toolbox
@@ -0,0 +1,130 @@
+"""Convergence history of the genetic algorithm, and optional plotting.
+
+matplotlib is only imported when plotting, so the solver does not need it.
+"""
+
+import numpy as np
+from deap import tools
+
+# Columns of the history array.
+HISTORY_COLUMNS = (
+    "gen",
+    "nevals",
+    "avg_distance",
+    "avg_waiting_time",
+    "min_distance",
+    "min_waiting_time",
+    "max_distance",
+    "max_waiting_time",
+)
+
+
+def fitness_statistics(fitness: np.ndarray) -> dict[str, np.ndarray]:
+    """Return the mean, min and max of an (n_individuals, 2) array of fitness values."""
+    return {
+        "avg": fitness.mean(axis=0),
+        "min": fitness.min(axis=0),
+        "max": fitness.max(axis=0),
+    }
+
+
+class SampledLogbook(tools.Logbook):
+    """Logbook of the statistics of every ``interval`` generations.
+
+    The generations in between are not recorded, but their evaluations are
+    added to the ``nevals`` of the next record, so that the ``nevals`` still
+    add up to all the evaluations. Once the logbook holds ``max_records``
+    records, the interval doubles and the records which are not due anymore are
+    dropped, again folding their ``nevals`` into the next record, so the memory
+    stays constant however long the run is.
+    """
+
+    def __init__(self, interval: int = 1, max_records: int | None = None):
+        super().__init__()
+        if interval < 1:
+            raise ValueError("the interval must be at least one generation.")
+        if max_records is not None and max_records < 2:
+            raise ValueError("the logbook must hold at least two records.")
+        self.header = ["gen", "nevals", "avg", "min", "max"]
+        self.interval = interval
+        self.max_records = max_records
+        self._skipped_nevals = 0
+
+    def due(self, gen: int) -> bool:
+        """Return whether generation ``gen`` is to be recorded."""
+        return gen % self.interval == 0
+
+    def recorded(self, gen: int) -> bool:
+        """Return whether generation ``gen`` is the last one recorded."""
+        return bool(self) and self[-1]["gen"] == gen
+
+    def skip(self, nevals: int) -> None:
+        """Account for the evaluations of a generation that is not recorded."""
+        self._skipped_nevals += nevals
+
+    def record(self, **infos):
+        while self.max_records is not None and len(self) >= self.max_records:
+            self._thin()
+        infos["nevals"] = infos.get("nevals", 0) + self._skipped_nevals
+        self._skipped_nevals = 0
+        super().record(**infos)
+
+    def _thin(self) -> None:
+        """Double the interval and drop the records that are not due anymore."""
+        printed = self.buffindex >= len(self)
+        self.interval *= 2
+        records, nevals = [], 0
+        for record in self:
+            nevals += record["nevals"]
+            if self.due(record["gen"]):
+                records.append({**record, "nevals": nevals})
+                nevals = 0
+        self[:] = records
+        self._skipped_nevals += nevals
+        self.buffindex = len(self) if printed else min(self.buffindex, len(self))
+
+
+def history_from_logbook(logbook) -> np.ndarray:
+    """Convert a logbook into an array with one row per record.
+
+    See HISTORY_COLUMNS for the meaning of the columns.
+    """
+    if not logbook:
+        return np.empty((0, len(HISTORY_COLUMNS)))
+    gen, nevals, avg, min_, max_ = logbook.select("gen", "nevals", "avg", "min", "max")
+    return np.column_stack((gen, nevals, avg, min_, max_)).astype(np.float64)
+
+
+def history_to_json(history: np.ndarray) -> dict[str, list]:
+    """Convert a history array into a JSON-serializable trace, column by column."""
+    return {
+        column: values.tolist() for column, values in zip(HISTORY_COLUMNS, history.T)
+    }
+
+
+def plot_history(history: np.ndarray, ax=None):
+    """Plot the optimization targets over the generations.
+
+    Draws on ``ax`` if given, otherwise on a new figure. Returns the axes.
+    """
+    import matplotlib.pyplot as plt
+
+    if ax is None:
+        _, ax = plt.subplots()
+    columns = dict(zip(HISTORY_COLUMNS, history.T))
+    gen = columns["gen"]
+
+    # Plot the max and mean values.
+    ax.plot(gen, columns["avg_distance"], color="blue", label="Mean Distance")
+    ax.plot(gen, columns["min_distance"], color="green", label="Min. Distance")
+    ax.plot(gen, columns["max_distance"], color="red", label="Max. Distance")
+
+    ax.plot(gen, columns["avg_waiting_time"], color="blue", label="Mean Waiting Time")
+    ax.plot(gen, columns["min_waiting_time"], color="green", label="Min. Waiting Time")
+    ax.plot(gen, columns["max_waiting_time"], color="red", label="Max. Waiting Time")
+
+    ax.legend(loc="lower right")
+    ax.set_xlabel("Generation")
+    ax.set_ylabel("Optimization Targets")
+    ax.set_title("Optimization Targets over Generations")
+    return ax
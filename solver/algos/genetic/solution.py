@@ -1,16 +1,31 @@
+import copy
 import random
 import sys
+import threading
 from functools import partial
 from pathlib import Path
 
-import matplotlib.pyplot as plt
 import numpy as np
 from deap import base, creator, tools
 
-from .utils import ea_simple_with_elitism
+from .islands import evolve_islands
+from .parallel import ParallelEvaluator
+from .population import SEED_PERTURBATION, make_toolbox
+from .reporting import SampledLogbook, history_from_logbook
+from .utils import (
+    Elite,
+    PhaseProfile,
+    Progress,
+    Termination,
+    Tracer,
+    TracerGroup,
+    ea_array_with_elitism,
+    ea_simple_with_elitism,
+)
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
-from models import Scenario
+from distance_cache import DistanceCache
+from models import Scenario, evaluate_gene_costs, evaluate_genes
 
 # Define the problem constraints.
 POPULATION_SIZE = 50
@@ -18,36 +33,74 @@ P_CROSSOVER = 0.9
 P_MUTATION = 0.4
 MAX_GENERATIONS = 500
 HALL_OF_FAME_SIZE = 5
+MIGRATION_INTERVAL = 25
+MIGRATION_SIZE = 2
+SEED_FRACTION = 0.0
+
+# Record the statistics of the population every STATS_INTERVAL generations, in
+# MAX_HISTORY records at most (see reporting.SampledLogbook).
+STATS_INTERVAL = 5
+MAX_HISTORY = 500
 
 # Define random seed.
 RANDOM_SEED = 13
 random.seed(RANDOM_SEED)
 
+# DEAP individual types, by objective weights.
+_individual_types: dict[tuple[float, float], type] = {}
+_individual_types_lock = threading.Lock()
+
+
+def _create_individual(num_taxis, num_customers):
+    """Define a function to create the individual.
+
+    Customers are served in a random order, each by a random taxi.
+    """
+    customers = list(range(1, num_customers + 1))
+    random.shuffle(customers)
+    taxis = random.choices(range(1, num_taxis + 1), k=num_customers)
+    return list(zip(taxis, customers))
 
-def _commission_taxi(
-    assigned_customers: set[int], num_taxis: int, num_customers: int
-) -> tuple[int, int] | None:
-    """Assign a taxi to a waiting customer."""
-    available_customers = [
-        c for c in range(1, num_customers + 1) if c not in assigned_customers
+
+def _create_seeded_individual(nearest_vehicles, num_taxis, perturbation):
+    """Create an individual close to the nearest-vehicle heuristic.
+
+    Each customer is served by its nearest taxi, except that, with probability
+    ``perturbation``, a random taxi is chosen instead to keep some diversity.
+    """
+    customers = list(range(1, len(nearest_vehicles) + 1))
+    random.shuffle(customers)
+    return [
+        (
+            (
+                random.randint(1, num_taxis)
+                if random.random() < perturbation
+                else int(nearest_vehicles[customer - 1]) + 1
+            ),
+            customer,
+        )
+        for customer in customers
     ]
-    if available_customers:
-        customer = random.choice(available_customers)
-        taxi = random.randint(1, num_taxis)
-        assigned_customers.add(customer)
-        return (taxi, customer)
-    return None
 
 
-def _create_individual(num_taxis, num_customers):
-    """Define a function to create the individual."""
-    assigned_customers = set()
-    individual = []
-    while len(individual) < num_customers:
-        commission = _commission_taxi(assigned_customers, num_taxis, num_customers)
-        if commission:
-            individual.append(commission)
-    return individual
+def _init_population(
+    n, individual, container, nearest_vehicles, num_taxis, seed_fraction
+):
+    """Create a population where a ``seed_fraction`` of it is seeded.
+
+    The seeded individuals come from the nearest-vehicle heuristic: the first
+    one exactly, the rest perturbed with ``SEED_PERTURBATION``.
+    """
+    n_seeded = round(n * seed_fraction)
+    seeded = [
+        container(
+            _create_seeded_individual(
+                nearest_vehicles, num_taxis, SEED_PERTURBATION if i else 0.0
+            )
+        )
+        for i in range(n_seeded)
+    ]
+    return seeded + [individual() for _ in range(n - n_seeded)]
 
 
 def _cxModifiedTwoPoint(ind1, ind2):
@@ -65,108 +118,509 @@ def _cxModifiedTwoPoint(ind1, ind2):
     return ind1, ind2
 
 
-def solve(
-    vehicles: list[dict],
-    customers: list[dict],
-    weight_distance: float = 1.0,
-    weight_waiting_time: float = 1.0,
-    population_size=POPULATION_SIZE,
-    p_crossover=P_CROSSOVER,
-    p_mutation=P_MUTATION,
-    max_generations=MAX_GENERATIONS,
-    hall_of_fame_size=HALL_OF_FAME_SIZE,
-) -> list[tuple[int, int]]:
-    """Solve a taxi commission problem with a genetic algorithm."""
-    scenario = Scenario(vehicles, customers)
-
-    # Optimization objectives.
-    creator.create(
-        "FitnessMulti",
-        base.Fitness,
-        weights=(-weight_distance, -weight_waiting_time),
-    )
-    # Define the individual type.
-    creator.create("Individual", list, fitness=creator.FitnessMulti)
+def _update_gene_costs(individual, positions: slice, scenario: Scenario):
+    """Update the cost bookkeeping of an individual for the changed genes."""
+    new_costs = scenario.calculate_gene_costs(individual[positions])
+    individual.total_cost += (new_costs - individual.gene_costs[positions]).sum(axis=0)
+    individual.gene_costs[positions] = new_costs
 
-    # Create the toolbox.
-    toolbox = base.Toolbox()
+
+def _cxIncrementalTwoPoint(ind1, ind2, scenario: Scenario):
+    """Same as _cxModifiedTwoPoint(), for individuals that track their gene costs.
+
+    Only the vehicles of the genes between the two cut points are exchanged, and
+    only the costs of those genes are recomputed.
+    """
+    # Same cut points as tools.cxTwoPoint.
+    size = min(len(ind1), len(ind2))
+    cxpoint1 = random.randint(1, size)
+    cxpoint2 = random.randint(1, size - 1)
+    if cxpoint2 >= cxpoint1:
+        cxpoint2 += 1
+    else:
+        cxpoint1, cxpoint2 = cxpoint2, cxpoint1
+
+    segment = slice(cxpoint1, cxpoint2)
+    genes1, genes2 = ind1[segment], ind2[segment]
+    ind1[segment] = [(v2, c1) for (_, c1), (v2, _) in zip(genes1, genes2)]
+    ind2[segment] = [(v1, c2) for (v1, _), (_, c2) in zip(genes1, genes2)]
+    _update_gene_costs(ind1, segment, scenario)
+    _update_gene_costs(ind2, segment, scenario)
+
+    return ind1, ind2
+
+
+def _mutIncrementalShuffleIndexes(individual, indpb):
+    """Same as tools.mutShuffleIndexes(), moving the gene costs with the genes.
+
+    Whole genes are swapped, so the total costs do not change.
+    """
+    size = len(individual)
+    for i in range(size):
+        if random.random() < indpb:
+            swap_indx = random.randint(0, size - 2)
+            if swap_indx >= i:
+                swap_indx += 1
+            individual[i], individual[swap_indx] = individual[swap_indx], individual[i]
+            individual.gene_costs[[i, swap_indx]] = individual.gene_costs[
+                [swap_indx, i]
+            ]
+
+    return (individual,)
+
+
+def _mutNeighbourhood(individual, candidates, indpb, scenario: Scenario | None = None):
+    """Reassign random genes to one of the nearest vehicles to their customer.
+
+    Each gene gets, with probability ``indpb``, a random vehicle among the
+    ``candidates`` of its customer, a list with the 1-based ids of the k nearest
+    vehicles to each customer. Given the ``scenario``, the gene costs of the
+    individual are updated for the changed genes.
+    """
+    changed = []
+    for i, (_, customer) in enumerate(individual):
+        if random.random() < indpb:
+            individual[i] = (random.choice(candidates[customer - 1]), customer)
+            changed.append(i)
+    if scenario is not None and changed:
+        new_costs = scenario.calculate_gene_costs([individual[i] for i in changed])
+        individual.total_cost += (new_costs - individual.gene_costs[changed]).sum(
+            axis=0
+        )
+        individual.gene_costs[changed] = new_costs
+
+    return (individual,)
+
+
+def _individual_type(weights: tuple[float, float]) -> type:
+    """Return the DEAP individual type for the given objective weights.
+
+    The fitness and individual types are created with the DEAP creator the first
+    time a combination of weights is used, and reused afterwards.
+    """
+    with _individual_types_lock:
+        if weights not in _individual_types:
+            suffix = len(_individual_types)
+            # Optimization objectives.
+            creator.create(f"FitnessMulti{suffix}", base.Fitness, weights=weights)
+            # Define the individual type.
+            creator.create(
+                f"Individual{suffix}",
+                list,
+                fitness=getattr(creator, f"FitnessMulti{suffix}"),
+            )
+            _individual_types[weights] = getattr(creator, f"Individual{suffix}")
+        return _individual_types[weights]
+
+
+def _run_deap(
+    scenario: Scenario,
+    toolbox: base.Toolbox,
+    weights: tuple[float, float],
+    population_size: int,
+    p_crossover: float,
+    p_mutation: float,
+    termination: Termination,
+    hall_of_fame_size: int,
+    batch_evaluation: bool,
+    incremental_evaluation: bool,
+    seed_fraction: float,
+    seed_vehicles: np.ndarray,
+    neighbourhood_size: int | None,
+    verbose: bool,
+    evaluator: ParallelEvaluator | None,
+    progress: Progress | None,
+    tracer: Tracer | None,
+    logbook: SampledLogbook,
+):
+    """Run the GA on DEAP individuals, i.e., lists of (vehicle, customer) tuples."""
+    num_taxis, num_customers = len(scenario.vehicles), len(scenario.customers)
+    individual_type = _individual_type(weights)
+
+    # Complete the toolbox with the operators that depend on the scenario.
     toolbox.register(
         "individual",
         tools.initIterate,
-        creator.Individual,
-        partial(
-            _create_individual, num_taxis=len(vehicles), num_customers=len(customers)
-        ),
+        individual_type,
+        partial(_create_individual, num_taxis=num_taxis, num_customers=num_customers),
+    )
+    toolbox.register(
+        "population",
+        _init_population,
+        individual=toolbox.individual,
+        container=individual_type,
+        nearest_vehicles=seed_vehicles,
+        num_taxis=num_taxis,
+        seed_fraction=seed_fraction,
     )
-    toolbox.register("population", tools.initRepeat, list, toolbox.individual)
 
     # Register the evaluation function.
-    toolbox.register("evaluate", scenario.calculate_cost)
+    if incremental_evaluation:
+        toolbox.register("evaluate", scenario.calculate_cost_incremental)
+    else:
+        toolbox.register("evaluate", scenario.calculate_cost)
+        if evaluator is not None:
+            toolbox.register("evaluate_population", evaluator.evaluate_individuals)
+        elif batch_evaluation:
+            toolbox.register("evaluate_population", scenario.calculate_costs)
 
     # Register the genetic operators.
-    toolbox.register("mate", _cxModifiedTwoPoint)
-    toolbox.register("mutate", tools.mutShuffleIndexes, indpb=1.0 / len(customers))
-    toolbox.register("select", tools.selTournament, tournsize=3)
-
-    # Create the statistics object.
-    stats = tools.Statistics(lambda ind: ind.fitness.values)
-
-    # Register the statistics object.
-    stats.register("avg", np.mean, axis=0)
-    stats.register("min", np.min, axis=0)
-    stats.register("max", np.max, axis=0)
+    if incremental_evaluation:
+        toolbox.register("mate", _cxIncrementalTwoPoint, scenario=scenario)
+    else:
+        toolbox.register("mate", _cxModifiedTwoPoint)
+    if neighbourhood_size is not None:
+        toolbox.register(
+            "mutate",
+            _mutNeighbourhood,
+            candidates=(scenario.k_nearest_vehicles(neighbourhood_size) + 1).tolist(),
+            indpb=1.0 / num_customers,
+            scenario=scenario if incremental_evaluation else None,
+        )
+    elif incremental_evaluation:
+        toolbox.register(
+            "mutate", _mutIncrementalShuffleIndexes, indpb=1.0 / num_customers
+        )
+    else:
+        toolbox.register("mutate", tools.mutShuffleIndexes, indpb=1.0 / num_customers)
 
     # Run the evolutionary algorithm
-    hof = tools.HallOfFame(hall_of_fame_size)
+    hof = Elite(hall_of_fame_size)
     population, logbook = ea_simple_with_elitism(
         toolbox.population(n=population_size),
         toolbox,
         cxpb=p_crossover,
         mutpb=p_mutation,
-        ngen=max_generations,
-        stats=stats,
+        ngen=termination.max_generations,
         halloffame=hof,
-        verbose=True,
+        verbose=verbose,
+        termination=termination,
+        progress=progress,
+        tracer=tracer,
+        logbook=logbook,
     )
 
     # Take the best individual as solution.
     solution = hof.items[0]
-    print("Best Individual")
-    print("===============")
-    print(solution)
-    print("\nWith fitness values of:", solution.fitness)
-    print()
-
-    # Return the min and mean values.
-    mean_fitness_vals, min_fitness_vals, max_fitness_vals = logbook.select(
-        "avg", "min", "max"
+    return solution, solution.fitness.values, logbook
+
+
+def _run_array(
+    scenario: Scenario,
+    weights: tuple[float, float],
+    population_size: int,
+    p_crossover: float,
+    p_mutation: float,
+    termination: Termination,
+    hall_of_fame_size: int,
+    incremental_evaluation: bool,
+    seed_fraction: float,
+    seed_vehicles: np.ndarray,
+    neighbourhood_size: int | None,
+    verbose: bool,
+    evaluator: ParallelEvaluator | None,
+    progress: Progress | None,
+    tracer: Tracer | None,
+    logbook: SampledLogbook,
+):
+    """Run the GA on an ArrayPopulation, with whole-population operators."""
+    num_taxis, num_customers = len(scenario.vehicles), len(scenario.customers)
+    rng = np.random.default_rng(RANDOM_SEED)
+
+    # Register the evaluation function.
+    if evaluator is not None:
+        evaluate_population = evaluator
+    else:
+        evaluate_population = partial(
+            evaluate_genes, scenario.pickup_distances, scenario.trip_distances
+        )
+
+    evaluate_costs_per_gene = None
+    if incremental_evaluation:
+        evaluate_costs_per_gene = partial(
+            evaluate_gene_costs, scenario.pickup_distances, scenario.trip_distances
+        )
+
+    # Create the toolbox.
+    toolbox = make_toolbox(
+        rng,
+        evaluate_population,
+        weights,
+        num_taxis,
+        num_customers,
+        evaluate_gene_costs=evaluate_costs_per_gene,
+        nearest_vehicles=seed_vehicles,
+        seed_fraction=seed_fraction,
+        candidate_vehicles=(
+            scenario.k_nearest_vehicles(neighbourhood_size)
+            if neighbourhood_size is not None
+            else None
+        ),
     )
 
-    mean_fitness_vals = np.array(mean_fitness_vals)
-    min_fitness_vals = np.array(min_fitness_vals)
-    max_fitness_vals = np.array(max_fitness_vals)
+    # Run the evolutionary algorithm
+    _, hof, logbook = ea_array_with_elitism(
+        toolbox.population(n=population_size),
+        toolbox,
+        cxpb=p_crossover,
+        mutpb=p_mutation,
+        ngen=termination.max_generations,
+        weights=weights,
+        hall_of_fame_size=hall_of_fame_size,
+        verbose=verbose,
+        termination=termination,
+        progress=progress,
+        tracer=tracer,
+        logbook=logbook,
+    )
+
+    # Take the best individual as solution.
+    return hof.individual(0), tuple(hof.fitness[0].tolist()), logbook
+
+
+class GeneticEngine:
+    """Genetic solver set up once per process.
+
+    The DEAP operators that do not depend on the scenario are created here once.
+    Each request gets a copy of the toolbox, completed with the operators for its
+    scenario, and objective weights map to DEAP types that are only created the
+    first time they are used.
+    """
+
+    def __init__(self):
+        self.toolbox = base.Toolbox()
+        self.toolbox.register("select", tools.selTournament, tournsize=3)
+
+        # Create the default DEAP types up front.
+        _individual_type((-1.0, -1.0))
+
+    def solve(
+        self,
+        vehicles: list[dict],
+        customers: list[dict],
+        weight_distance: float = 1.0,
+        weight_waiting_time: float = 1.0,
+        population_size=POPULATION_SIZE,
+        p_crossover=P_CROSSOVER,
+        p_mutation=P_MUTATION,
+        max_generations=MAX_GENERATIONS,
+        hall_of_fame_size=HALL_OF_FAME_SIZE,
+        batch_evaluation: bool = True,
+        incremental_evaluation: bool = False,
+        seed_fraction: float = SEED_FRACTION,
+        initial_allocation: list[tuple[str, str]] | None = None,
+        neighbourhood_size: int | None = None,
+        representation: str = "deap",
+        n_workers: int | None = None,
+        n_islands: int = 1,
+        migration_interval: int = MIGRATION_INTERVAL,
+        migration_size: int = MIGRATION_SIZE,
+        max_seconds: float | None = None,
+        stagnation_generations: int | None = None,
+        stagnation_epsilon: float = 0.0,
+        cancel_event: threading.Event | None = None,
+        progress=None,
+        progress_generations: int | None = None,
+        progress_seconds: float | None = None,
+        stats_interval: int = STATS_INTERVAL,
+        max_history: int | None = MAX_HISTORY,
+        profile: bool = False,
+        profile_generations: bool = False,
+        tracer: Tracer | None = None,
+        distance_cache: DistanceCache | None = None,
+        scenario: Scenario | None = None,
+        verbose: bool = False,
+    ) -> tuple[list[tuple[str, str]], tuple[float, float], dict]:
+        """Solve a taxi commission problem with a genetic algorithm.
+
+        With ``batch_evaluation``, every generation's invalid individuals are stacked
+        into a single array and evaluated with one vectorized call.
+
+        With ``incremental_evaluation``, the individuals keep the costs of each of
+        their genes, and crossover and mutation only recompute the costs of the genes
+        they change. This takes precedence over ``batch_evaluation`` and ``n_workers``.
+
+        A ``seed_fraction`` of the initial population is seeded from the
+        nearest-vehicle heuristic, so the search starts near a good solution. With
+        an ``initial_allocation`` of ``(vehicle_id, customer_id)`` pairs, such as
+        the solution of the scenario before it changed, the seeded individuals
+        come from that allocation instead, and the customers it misses get their
+        nearest vehicle (see models.Scenario.allocated_vehicles()).
+
+        With ``neighbourhood_size``, mutation reassigns genes to one of the
+        ``neighbourhood_size`` nearest vehicles to their customer, instead of
+        swapping random genes, after which the crossover mostly pairs customers
+        with far away taxis.
+
+        ``representation`` selects how the individuals are stored: ``"deap"`` uses
+        DEAP lists of ``(vehicle, customer)`` tuples, ``"array"`` holds the whole
+        population in NumPy arrays and applies the genetic operators to all the
+        individuals at once.
+
+        With ``n_workers`` greater than one, the fitness evaluation is split in
+        chunks across a pool of that many worker processes, which share the distance
+        tables of the scenario.
+
+        With ``n_islands`` greater than one, the island model is used instead: that
+        many independent array-backed populations evolve in parallel, one process
+        each, and every ``migration_interval`` generations each island sends its
+        ``migration_size`` best individuals to the next one. The solution is the best
+        hall of fame member across all the islands. The island model requires the
+        array representation, and ``n_workers`` is not used.
+
+        The run stops after ``max_generations``, after ``max_seconds`` of wall-clock
+        time, or once the best weighted fitness has not improved by more than
+        ``stagnation_epsilon`` for ``stagnation_generations`` generations, whichever
+        comes first. It also stops once ``cancel_event`` is set, if given; with the
+        island model, this is checked between migrations. Besides the solution and
+        its fitness values, a dictionary is returned with the reason why the run
+        stopped, the generations it ran, and the convergence ``history`` as an array
+        (see reporting.HISTORY_COLUMNS).
 
-    mean_distance_vals = mean_fitness_vals[:, 0]
-    min_distance_vals = min_fitness_vals[:, 0]
-    max_distance_vals = max_fitness_vals[:, 0]
+        The statistics of the population are computed from an array of its fitness
+        values every ``stats_interval`` generations only, and on the last one. The
+        history holds ``max_history`` records at most: past that, its interval
+        doubles and every other record is dropped (see reporting.SampledLogbook),
+        so its memory stays constant. ``nevals`` counts all the evaluations since
+        the previous record.
 
-    mean_waiting_vals = mean_fitness_vals[:, 1]
-    min_waiting_vals = min_fitness_vals[:, 1]
-    max_waiting_vals = max_fitness_vals[:, 1]
+        While the GA runs, ``progress(gen, solution, fitness_values)`` is called, if
+        given, with the best solution so far in the same format as the result, every
+        ``progress_generations`` generations or ``progress_seconds`` seconds (see
+        utils.Progress).
 
-    # Plot the max and mean values.
-    plt.plot(mean_distance_vals, color="blue", label="Mean Distance")
-    plt.plot(min_distance_vals, color="green", label="Min. Distance")
-    plt.plot(max_distance_vals, color="red", label="Max. Distance")
+        With ``profile``, the wall time and the number of calls of each phase of
+        the GA loop (selection, variation, evaluation...) are accumulated, and the
+        returned dictionary holds them as a utils.PhaseProfile under ``profile``.
+        With ``profile_generations`` too, the seconds of the phases are recorded
+        per generation as well, sampled like the history, every ``stats_interval``
+        generations in ``max_history`` records at most. With the island model, the
+        phases of all the islands are added up. A ``tracer`` (see utils.Tracer) is
+        called around every phase as well; it is not used by the island model,
+        whose phases run in other processes.
 
-    plt.plot(mean_waiting_vals, color="blue", label="Mean Waiting Time")
-    plt.plot(min_waiting_vals, color="green", label="Min. Waiting Time")
-    plt.plot(max_waiting_vals, color="red", label="Max. Waiting Time")
+        With a ``distance_cache``, the distance tables computed for the same
+        coordinates before are read from it instead of being computed again. A
+        ``scenario`` already built from the vehicles and customers, e.g., for the
+        random baseline, is used as is, without computing its tables again.
 
-    plt.legend(loc="lower right")
-    plt.xlabel("Generation")
-    plt.ylabel("Optimization Targets")
-    plt.title("Optimization Targets over Generations")
-    # plt.show()
+        Nothing is printed unless ``verbose`` is set, in which case the statistics
+        of the recorded generations and the best individual are printed.
+        """
+        if representation not in ("deap", "array"):
+            raise ValueError(f"unknown representation: {representation!r}")
+        if n_islands > 1 and representation != "array":
+            raise ValueError("the island model requires the array representation.")
 
-    return scenario.solution_to_real_ids(solution), solution.fitness.values
+        if scenario is None:
+            scenario = Scenario(vehicles, customers, distance_cache)
+        weights = (-weight_distance, -weight_waiting_time)
+        termination = Termination(
+            max_generations,
+            max_seconds=max_seconds,
+            stagnation_generations=stagnation_generations,
+            stagnation_epsilon=stagnation_epsilon,
+            cancel_event=cancel_event,
+        )
+        evaluator = None
+        if n_islands > 1:
+            n_workers = None
+        if n_workers is not None and n_workers > 1:
+            evaluator = ParallelEvaluator(scenario, n_workers)
+        reporter = None
+        if progress is not None:
+
+            def report(gen, individual, fitness_values):
+                progress(gen, scenario.solution_to_real_ids(individual), fitness_values)
+
+            reporter = Progress(
+                report,
+                every_generations=progress_generations,
+                every_seconds=progress_seconds,
+            )
+        phase_profile = None
+        if profile:
+            phase_profile = (
+                PhaseProfile(stats_interval, max_history)
+                if profile_generations
+                else PhaseProfile()
+            )
+        tracers = [t for t in (phase_profile, tracer) if t is not None]
+        phase_tracer = TracerGroup(tracers) if tracers else None
+        if initial_allocation is not None:
+            seed_vehicles = scenario.allocated_vehicles(initial_allocation)
+        else:
+            seed_vehicles = scenario.nearest_vehicles()
+        # Settings shared by all the ways of running the GA.
+        settings = dict(
+            weights=weights,
+            population_size=population_size,
+            p_crossover=p_crossover,
+            p_mutation=p_mutation,
+            termination=termination,
+            hall_of_fame_size=hall_of_fame_size,
+            incremental_evaluation=incremental_evaluation,
+            seed_fraction=seed_fraction,
+            seed_vehicles=seed_vehicles,
+            neighbourhood_size=neighbourhood_size,
+            verbose=verbose,
+            progress=reporter,
+            logbook=SampledLogbook(stats_interval, max_history),
+        )
+        try:
+            if n_islands > 1:
+                solution, fitness_values, logbook = evolve_islands(
+                    scenario,
+                    n_islands=n_islands,
+                    migration_interval=migration_interval,
+                    migration_size=migration_size,
+                    random_seed=RANDOM_SEED,
+                    profile=phase_profile,
+                    **settings,
+                )
+            elif representation == "deap":
+                solution, fitness_values, logbook = _run_deap(
+                    scenario,
+                    toolbox=copy.copy(self.toolbox),
+                    batch_evaluation=batch_evaluation,
+                    evaluator=evaluator,
+                    tracer=phase_tracer,
+                    **settings,
+                )
+            else:
+                solution, fitness_values, logbook = _run_array(
+                    scenario, evaluator=evaluator, tracer=phase_tracer, **settings
+                )
+        finally:
+            if evaluator is not None:
+                evaluator.close()
+
+        if verbose:
+            print("Best Individual")
+            print("===============")
+            print(solution)
+            print("\nWith fitness values of:", fitness_values)
+            print()
+
+        info = {
+            "termination_reason": termination.reason,
+            "generations": termination.generations,
+            "history": history_from_logbook(logbook),
+        }
+        if phase_profile is not None:
+            info["profile"] = phase_profile
+        return scenario.solution_to_real_ids(solution), fitness_values, info
+
+
+_default_engine: GeneticEngine | None = None
+
+
+def solve(vehicles: list[dict], customers: list[dict], **kwargs):
+    """Solve a taxi commission problem with the default GeneticEngine.
+
+    See GeneticEngine.solve() for the parameters.
+    """
+    global _default_engine
+    if _default_engine is None:
+        _default_engine = GeneticEngine()
+    return _default_engine.solve(vehicles, customers, **kwargs)
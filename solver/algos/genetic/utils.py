@@ -5,7 +5,356 @@ https://github.com/DreamJarsAI/Apply-AI-like-a-Pro, licensed under the MIT
 license.
 """
 
-from deap import algorithms, tools
+import time
+from contextlib import contextmanager, nullcontext
+
+import numpy as np
+from deap import algorithms
+
+from .population import rank, var_and
+from .reporting import SampledLogbook, fitness_statistics
+
+
+class Termination:
+    """Decide when the generational process stops.
+
+    The process stops at whichever limit comes first: ``max_generations``, a
+    wall-clock budget of ``max_seconds``, or ``stagnation_generations``
+    generations in a row without the best weighted fitness improving by more than
+    ``stagnation_epsilon``. It also stops as soon as the optional
+    ``cancel_event`` (a ``threading.Event``) is set. After stopping, ``reason``
+    tells which limit was hit and ``generations`` how many generations were run.
+    """
+
+    MAX_GENERATIONS = "max_generations"
+    TIME_BUDGET = "time_budget"
+    STAGNATION = "stagnation"
+    CANCELLED = "cancelled"
+
+    def __init__(
+        self,
+        max_generations,
+        max_seconds=None,
+        stagnation_generations=None,
+        stagnation_epsilon=0.0,
+        cancel_event=None,
+    ):
+        self.max_generations = max_generations
+        self.max_seconds = max_seconds
+        self.stagnation_generations = stagnation_generations
+        self.stagnation_epsilon = stagnation_epsilon
+        self.cancel_event = cancel_event
+        self.start()
+
+    def start(self):
+        """Restart the clock and forget the best fitness seen so far."""
+        self._start_time = time.perf_counter()
+        self._best = None
+        self._last_improvement = 0
+        self.reason = None
+        self.generations = 0
+
+    @property
+    def elapsed_seconds(self):
+        return time.perf_counter() - self._start_time
+
+    def should_stop(self, gen, best_wvalues):
+        """Check the limits after ``gen`` generations.
+
+        ``best_wvalues`` are the weighted fitness values of the best individual so
+        far; their sum is used to detect improvements.
+        """
+        self.generations = gen
+        score = float(sum(best_wvalues))
+        if self._best is None or score > self._best + self.stagnation_epsilon:
+            self._best = score
+            self._last_improvement = gen
+
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            self.reason = self.CANCELLED
+        elif gen >= self.max_generations:
+            self.reason = self.MAX_GENERATIONS
+        elif self.max_seconds is not None and self.elapsed_seconds >= self.max_seconds:
+            self.reason = self.TIME_BUDGET
+        elif (
+            self.stagnation_generations is not None
+            and gen - self._last_improvement >= self.stagnation_generations
+        ):
+            self.reason = self.STAGNATION
+        return self.reason is not None
+
+
+class Progress:
+    """Report the best individual found so far while the GA runs.
+
+    ``callback(gen, individual, fitness_values)`` receives the 1-based genes of
+    the best individual. It is called after the first generation, and then
+    whenever ``every_generations`` generations or ``every_seconds`` seconds have
+    passed since the last report, whichever comes first, or after every
+    generation if neither is given. Nothing is reported while the best fitness
+    does not change.
+    """
+
+    def __init__(self, callback, every_generations=None, every_seconds=None):
+        self.callback = callback
+        self.every_generations = every_generations
+        self.every_seconds = every_seconds
+        self._last_gen = None
+        self._last_time = None
+        self._last_fitness = None
+
+    def due(self, gen):
+        """Whether a report is due after ``gen`` generations."""
+        if self._last_gen is None:
+            return True
+        if self.every_generations is None and self.every_seconds is None:
+            return True
+        return (
+            self.every_generations is not None
+            and gen - self._last_gen >= self.every_generations
+        ) or (
+            self.every_seconds is not None
+            and time.perf_counter() - self._last_time >= self.every_seconds
+        )
+
+    def report(self, gen, individual, fitness_values):
+        self._last_gen = gen
+        self._last_time = time.perf_counter()
+        if fitness_values != self._last_fitness:
+            self._last_fitness = fitness_values
+            self.callback(gen, individual, fitness_values)
+
+
+class Tracer:
+    """Hooks called around the phases of every generation of the GA loops.
+
+    The phases are listed in PHASES: selection, variation, evaluation, the
+    update of the hall of fame, the statistics and the progress reports.
+    Generation 0 is the evaluation of the initial population. Subclass it and
+    override the hooks to plug in another tracer.
+    """
+
+    PHASES = ("select", "vary", "evaluate", "hall_of_fame", "statistics", "progress")
+
+    def phase_started(self, phase, gen):
+        pass
+
+    def phase_finished(self, phase, gen, seconds):
+        pass
+
+
+class TracerGroup(Tracer):
+    """Forward the hooks to several tracers."""
+
+    def __init__(self, tracers):
+        self.tracers = list(tracers)
+
+    def phase_started(self, phase, gen):
+        for tracer in self.tracers:
+            tracer.phase_started(phase, gen)
+
+    def phase_finished(self, phase, gen, seconds):
+        for tracer in self.tracers:
+            tracer.phase_finished(phase, gen, seconds)
+
+
+class PhaseProfile(Tracer):
+    """Accumulate the wall time and the number of calls of each phase.
+
+    ``seconds[phase]`` holds the total time spent in the phase, and
+    ``calls[phase]`` how many times it ran. With an ``interval``, the seconds of
+    each phase are also recorded per generation, sampled like the history (see
+    reporting.SampledLogbook): every ``interval`` generations, each record
+    holding the seconds since the previous one, in ``max_records`` records at
+    most, past which the interval doubles.
+    """
+
+    def __init__(self, interval: int | None = None, max_records: int | None = None):
+        self.seconds = {}
+        self.calls = {}
+        self.interval = interval
+        self.max_records = max_records
+        self.generations = {}
+        self._last_gen = 0
+
+    def _add(self, phase, gen, seconds):
+        """Add the seconds of a phase to the record of generation ``gen``."""
+        self._last_gen = max(self._last_gen, gen)
+        # The seconds count for the next generation due, like skipped nevals.
+        due = -(-gen // self.interval) * self.interval
+        record = self.generations.setdefault(due, {})
+        record[phase] = record.get(phase, 0.0) + seconds
+        while self.max_records is not None and len(self.generations) > self.max_records:
+            self._thin()
+
+    def _thin(self):
+        """Double the interval and fold the records that are not due anymore."""
+        self.interval *= 2
+        records, self.generations = self.generations, {}
+        for gen, record in sorted(records.items()):
+            due = self.generations.setdefault(
+                -(-gen // self.interval) * self.interval, {}
+            )
+            for phase, seconds in record.items():
+                due[phase] = due.get(phase, 0.0) + seconds
+
+    def phase_finished(self, phase, gen, seconds):
+        self.seconds[phase] = self.seconds.get(phase, 0.0) + seconds
+        self.calls[phase] = self.calls.get(phase, 0) + 1
+        if self.interval is not None:
+            self._add(phase, gen, seconds)
+
+    def merge(self, other, gen_offset=0):
+        """Add the times and calls of another profile, shifted by ``gen_offset``."""
+        for phase, seconds in other.seconds.items():
+            self.seconds[phase] = self.seconds.get(phase, 0.0) + seconds
+            self.calls[phase] = self.calls.get(phase, 0) + other.calls[phase]
+        if self.interval is not None:
+            for gen, record in other._records().items():
+                for phase, seconds in record.items():
+                    self._add(phase, gen_offset + gen, seconds)
+
+    def _records(self):
+        """Return the records by generation, the last one at the last generation."""
+        return {
+            min(gen, self._last_gen): record for gen, record in self.generations.items()
+        }
+
+    def summary(self, per_generation=False):
+        """Return the total seconds and calls of each phase, in a JSON-able dict.
+
+        With ``per_generation``, the sampled seconds of each phase are included as
+        well, column by column like reporting.history_to_json(), if recorded.
+        """
+        phases = [phase for phase in self.PHASES if phase in self.calls]
+        summary = {
+            "phases": {
+                phase: {"seconds": self.seconds[phase], "calls": self.calls[phase]}
+                for phase in phases
+            }
+        }
+        if per_generation and self.interval is not None:
+            records = sorted(self._records().items())
+            summary["generations"] = {
+                "gen": [gen for gen, _ in records],
+                **{
+                    phase: [record.get(phase, 0.0) for _, record in records]
+                    for phase in phases
+                },
+            }
+        return summary
+
+
+@contextmanager
+def _traced_phase(tracer, phase, gen):
+    tracer.phase_started(phase, gen)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        tracer.phase_finished(phase, gen, time.perf_counter() - start)
+
+
+def _phase(tracer, phase, gen):
+    """Context manager around a phase of the GA loop, traced if there is a tracer."""
+    if tracer is None:
+        return nullcontext()
+    return _traced_phase(tracer, phase, gen)
+
+
+class Elite:
+    """Hall of fame that keeps the best individuals without copying them.
+
+    DEAP's HallOfFame deep-copies every individual it admits. Here, update()
+    ranks the fitness values of the candidates and keeps references to the best
+    ``maxsize`` ones. This is safe since the individuals are not changed once
+    evaluated: varAnd() clones them before crossover and mutation. As in the
+    HallOfFame, a candidate identical to a member, such as an unchanged clone of
+    it, is not admitted again, and ties are won by the current members.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.items = []
+
+    def update(self, population):
+        """Update the elite with the individuals of ``population``."""
+        members = {id(ind) for ind in self.items}
+        candidates = [ind for ind in population if id(ind) not in members]
+        candidates += self.items
+        wvalues = np.array([ind.fitness.wvalues for ind in candidates])
+        ranks = rank(wvalues, (1.0,) * wvalues.shape[1])
+        items = []
+        for i in np.argsort(-ranks).tolist():
+            candidate = candidates[i]
+            # Comparing the fitness first keeps the check cheap.
+            if not any(
+                candidate.fitness.wvalues == item.fitness.wvalues and candidate == item
+                for item in items
+            ):
+                items.append(candidate)
+                if len(items) == self.maxsize:
+                    break
+        self.items = items
+
+    def __len__(self):
+        return len(self.items)
+
+    def __getitem__(self, index):
+        return self.items[index]
+
+    def __iter__(self):
+        return iter(self.items)
+
+
+def _elite_indices(population, ranks, size):
+    """Return the indices of the ``size`` best distinct individuals, best first.
+
+    An individual with the same fitness and genes as a better one is skipped, as
+    in Elite.update().
+    """
+    fitness = population.fitness.tolist()
+    elite = []
+    for i in np.argsort(-ranks).tolist():
+        if not any(
+            fitness[i] == fitness[j]
+            and np.array_equal(population.vehicles[i], population.vehicles[j])
+            and np.array_equal(population.customers[i], population.customers[j])
+            for j in elite
+        ):
+            elite.append(i)
+            if len(elite) == size:
+                break
+    return np.array(elite)
+
+
+def _record(logbook, gen, nevals, statistics, verbose, final=False):
+    """Record the ``statistics()`` of a generation, if due or ``final``."""
+    if not (final or logbook.due(gen)):
+        logbook.skip(nevals)
+        return
+    logbook.record(gen=gen, nevals=nevals, **statistics())
+    if verbose:
+        print(logbook.stream)
+
+
+def _evaluate_invalid(individuals, toolbox):
+    """Evaluate the individuals with an invalid fitness.
+
+    If the toolbox has an ``evaluate_population`` function registered, all the
+    individuals are evaluated with a single batched call that returns an array of
+    fitnesses. Otherwise, ``toolbox.evaluate`` is mapped over them one by one.
+    """
+    invalid_ind = [ind for ind in individuals if not ind.fitness.valid]
+    if not invalid_ind:
+        return invalid_ind
+    if hasattr(toolbox, "evaluate_population"):
+        fitnesses = map(tuple, toolbox.evaluate_population(invalid_ind).tolist())
+    else:
+        fitnesses = toolbox.map(toolbox.evaluate, invalid_ind)
+    for ind, fit in zip(invalid_ind, fitnesses):
+        ind.fitness.values = fit
+    return invalid_ind
 
 
 def ea_simple_with_elitism(
@@ -17,59 +366,199 @@ def ea_simple_with_elitism(
     stats=None,
     halloffame=None,
     verbose=False,
+    termination=None,
+    progress=None,
+    tracer=None,
+    logbook=None,
 ):
     """This algorithm is similar to DEAP eaSimple() algorithm, with the modification that
     halloffame is used to implement an elitism mechanism. The individuals contained in the
     halloffame are directly injected into the next generation and are not subject to the
-    genetic operators of selection, crossover and mutation.
+    genetic operators of selection, crossover and mutation. It can be a DEAP
+    HallOfFame or an Elite, which does not copy the individuals.
+
+    If a Termination is given, it decides when to stop instead of ``ngen``. If a
+    Progress is given, the best individual is reported to it along the way. If a
+    Tracer is given, it is called around each phase of each generation.
+
+    The statistics are recorded in a SampledLogbook, by default a new one
+    recording every generation, and the last generation is always recorded. They
+    are computed by ``stats``, if given, or else from an array of the fitness
+    values.
     """
-    logbook = tools.Logbook()
-    logbook.header = ["gen", "nevals"] + (stats.fields if stats else [])
+    if termination is None:
+        termination = Termination(ngen)
 
-    # Evaluate the individuals with an invalid fitness
-    invalid_ind = [ind for ind in population if not ind.fitness.valid]
-    fitnesses = toolbox.map(toolbox.evaluate, invalid_ind)
-    for ind, fit in zip(invalid_ind, fitnesses):
-        ind.fitness.values = fit
+    if logbook is None:
+        logbook = SampledLogbook()
+    if stats is not None:
+        logbook.header = ["gen", "nevals"] + stats.fields
+
+    def statistics():
+        if stats is not None:
+            return stats.compile(population)
+        return fitness_statistics(np.array([ind.fitness.values for ind in population]))
 
     if halloffame is None:
         raise ValueError("halloffame parameter must not be empty!")
 
-    halloffame.update(population)
+    # Evaluate the individuals with an invalid fitness
+    with _phase(tracer, "evaluate", 0):
+        invalid_ind = _evaluate_invalid(population, toolbox)
+
+    with _phase(tracer, "hall_of_fame", 0):
+        halloffame.update(population)
     hof_size = len(halloffame.items) if halloffame.items else 0
 
-    record = stats.compile(population) if stats else {}
-    logbook.record(gen=0, nevals=len(invalid_ind), **record)
-    if verbose:
-        print(logbook.stream)
+    with _phase(tracer, "statistics", 0):
+        _record(logbook, 0, len(invalid_ind), statistics, verbose)
+    if progress is not None:
+        with _phase(tracer, "progress", 0):
+            progress.report(0, halloffame.items[0], halloffame.items[0].fitness.values)
 
     # Begin the generational process
-    for gen in range(1, ngen + 1):
+    gen = 0
+    while not termination.should_stop(gen, halloffame.items[0].fitness.wvalues):
+        gen += 1
         # Select the next generation individuals
-        offspring = toolbox.select(population, len(population) - hof_size)
+        with _phase(tracer, "select", gen):
+            offspring = toolbox.select(population, len(population) - hof_size)
 
         # Vary the pool of individuals
-        offspring = algorithms.varAnd(offspring, toolbox, cxpb, mutpb)
+        with _phase(tracer, "vary", gen):
+            offspring = algorithms.varAnd(offspring, toolbox, cxpb, mutpb)
 
         # Evaluate the individuals with an invalid fitness
-        invalid_ind = [ind for ind in offspring if not ind.fitness.valid]
-        fitnesses = toolbox.map(toolbox.evaluate, invalid_ind)
-        for ind, fit in zip(invalid_ind, fitnesses):
-            ind.fitness.values = fit
+        with _phase(tracer, "evaluate", gen):
+            invalid_ind = _evaluate_invalid(offspring, toolbox)
 
-        # add the best back to population:
-        offspring.extend(halloffame.items)
+        with _phase(tracer, "hall_of_fame", gen):
+            # add the best back to population:
+            offspring.extend(halloffame.items)
 
-        # Update the hall of fame with the generated individuals
-        halloffame.update(offspring)
+            # Update the hall of fame with the generated individuals
+            halloffame.update(offspring)
 
         # Replace the current population by the offspring
         population[:] = offspring
 
         # Append the current generation statistics to the logbook
-        record = stats.compile(population) if stats else {}
-        logbook.record(gen=gen, nevals=len(invalid_ind), **record)
-        if verbose:
-            print(logbook.stream)
+        with _phase(tracer, "statistics", gen):
+            _record(logbook, gen, len(invalid_ind), statistics, verbose)
+        if progress is not None and progress.due(gen):
+            with _phase(tracer, "progress", gen):
+                progress.report(
+                    gen, halloffame.items[0], halloffame.items[0].fitness.values
+                )
 
+    if not logbook.recorded(gen):
+        _record(logbook, gen, 0, statistics, verbose, final=True)
     return population, logbook
+
+
+def ea_array_with_elitism(
+    population,
+    toolbox,
+    cxpb,
+    mutpb,
+    ngen,
+    weights,
+    hall_of_fame_size,
+    verbose=False,
+    termination=None,
+    progress=None,
+    tracer=None,
+    logbook=None,
+):
+    """Counterpart of ea_simple_with_elitism() for an ArrayPopulation.
+
+    Selection, variation and evaluation act on the whole population at once. The
+    ``hall_of_fame_size`` best distinct individuals found so far are kept aside
+    and injected unchanged into each new generation. They are only copied out of
+    the population when they change.
+
+    If a Termination is given, it decides when to stop instead of ``ngen``. If a
+    Progress is given, the best individual is reported to it along the way. If a
+    Tracer is given, it is called around each phase of each generation. The
+    statistics are recorded in ``logbook`` as in ea_simple_with_elitism().
+    """
+    if termination is None:
+        termination = Termination(ngen)
+
+    if logbook is None:
+        logbook = SampledLogbook()
+
+    def statistics():
+        return fitness_statistics(population.fitness)
+
+    def evaluate(pop):
+        invalid = pop.invalid
+        if not invalid.any():
+            return 0
+        if pop.gene_costs is None:
+            pop.fitness[invalid] = toolbox.evaluate_population(
+                pop.vehicles[invalid], pop.customers[invalid]
+            )
+        else:
+            gene_costs = toolbox.evaluate_gene_costs(
+                pop.vehicles[invalid], pop.customers[invalid]
+            )
+            pop.gene_costs[invalid] = gene_costs
+            pop.fitness[invalid] = gene_costs.sum(axis=1)
+        return int(invalid.sum())
+
+    def record(gen, nevals):
+        with _phase(tracer, "statistics", gen):
+            _record(logbook, gen, nevals, statistics, verbose)
+        if progress is not None and progress.due(gen):
+            with _phase(tracer, "progress", gen):
+                progress.report(
+                    gen,
+                    halloffame.individual(0),
+                    tuple(halloffame.fitness[0].tolist()),
+                )
+
+    with _phase(tracer, "evaluate", 0):
+        nevals = evaluate(population)
+    with _phase(tracer, "hall_of_fame", 0):
+        ranks = rank(population.fitness, weights)
+        halloffame = population.take(
+            _elite_indices(population, ranks, hall_of_fame_size)
+        )
+    record(0, nevals)
+
+    # Begin the generational process
+    gen = 0
+    while not termination.should_stop(gen, halloffame.fitness[0] * weights):
+        gen += 1
+        # Select the next generation individuals
+        with _phase(tracer, "select", gen):
+            selected = toolbox.select(population, len(population) - len(halloffame))
+
+        # Vary the pool of individuals
+        with _phase(tracer, "vary", gen):
+            offspring, nvaried = var_and(
+                population.take(selected), toolbox, cxpb, mutpb
+            )
+
+        # Evaluate the individuals with an invalid fitness, unless their fitness
+        # has already been updated incrementally
+        with _phase(tracer, "evaluate", gen):
+            nevals = evaluate(offspring) if offspring.gene_costs is None else nvaried
+
+        # Add the best back to population, which also makes the hall of fame
+        # the top individuals of the new population.
+        with _phase(tracer, "hall_of_fame", gen):
+            population = offspring.concatenate(halloffame)
+            ranks = rank(population.fitness, weights)
+            elite = _elite_indices(population, ranks, hall_of_fame_size)
+            # The hall of fame is the last rows of the population, in order,
+            # unless an offspring entered it.
+            if not np.array_equal(elite, np.arange(len(offspring), len(population))):
+                halloffame = population.take(elite)
+
+        record(gen, nevals)
+
+    if not logbook.recorded(gen):
+        _record(logbook, gen, 0, statistics, verbose, final=True)
+    return population, halloffame, logbook
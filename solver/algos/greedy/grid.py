@@ -0,0 +1,202 @@
+"""Uniform grid over the vehicle positions for nearest-vehicle queries.
+
+The grid works on coordinates projected with project() onto a local
+equirectangular plane, in kilometers, so that the grid cells are square. At city
+scale the projected distances rank the vehicles like the haversine distances
+used for the costs.
+"""
+
+import numpy as np
+
+EARTH_RADIUS: float = 6371.0
+
+# Average number of vehicles per cell.
+VEHICLES_PER_CELL: float = 2.0
+
+# Maximum number of distances computed at once by the exhaustive search.
+EXHAUSTIVE_CHUNK: int = 1 << 20
+
+
+def project(coords: np.ndarray, reference_latitude: float) -> np.ndarray:
+    """Project ``(latitude, longitude)`` pairs in degrees onto a plane in km."""
+    radians = np.radians(coords)
+    return np.column_stack(
+        (
+            radians[:, 0] * EARTH_RADIUS,
+            radians[:, 1] * EARTH_RADIUS * np.cos(np.radians(reference_latitude)),
+        )
+    )
+
+
+def _ring(radius: int) -> np.ndarray:
+    """Offsets of the cells at Chebyshev distance ``radius`` from a cell."""
+    if radius == 0:
+        return np.zeros((1, 2), dtype=np.intp)
+    side = np.arange(-radius, radius + 1)
+    inner = side[1:-1]
+    return np.concatenate(
+        (
+            np.column_stack((np.full_like(side, -radius), side)),
+            np.column_stack((np.full_like(side, radius), side)),
+            np.column_stack((inner, np.full_like(inner, -radius))),
+            np.column_stack((inner, np.full_like(inner, radius))),
+        )
+    )
+
+
+class VehicleGrid:
+    """Bucket the projected vehicle positions into square cells.
+
+    The vehicles are sorted by cell, and ``_cell_start`` holds the offset of
+    the first vehicle of each cell, so a cell is a slice of ``_order``.
+    """
+
+    def __init__(
+        self, points: np.ndarray, vehicles_per_cell: float = VEHICLES_PER_CELL
+    ):
+        self.points = points
+        self.vehicles_per_cell = vehicles_per_cell
+        self._lower = points.min(axis=0)
+        height, width = points.max(axis=0) - self._lower
+        self.cell_size = max(
+            np.sqrt(height * width * vehicles_per_cell / len(points)),
+            max(height, width) * vehicles_per_cell / len(points),
+            1e-3,
+        )
+        self.shape = (
+            int(height // self.cell_size) + 1,
+            int(width // self.cell_size) + 1,
+        )
+
+        cells = self._cells(self.points)
+        self._order = np.argsort(cells, kind="stable")
+        self._cell_start = np.searchsorted(
+            cells[self._order], np.arange(self.shape[0] * self.shape[1] + 1)
+        )
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def _cell_coords(self, points: np.ndarray) -> np.ndarray:
+        """Return the (row, column) of the cell of each point, clipped to the grid.
+
+        Clipping keeps the ring search correct for points outside the grid, as
+        they are at least as far from the cells as the clipped cell is.
+        """
+        cell_coords = ((points - self._lower) // self.cell_size).astype(np.intp)
+        return np.clip(cell_coords, 0, np.array(self.shape) - 1)
+
+    def _cells(self, points: np.ndarray) -> np.ndarray:
+        rows, cols = self._cell_coords(points).T
+        return rows * self.shape[1] + cols
+
+    def k_nearest(self, points: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        """Find the ``k`` nearest vehicles to each of the projected ``points``.
+
+        Returns the vehicle indices and the distances, both of shape
+        ``(len(points), k)`` and sorted by distance. If there are fewer than
+        ``k`` vehicles, the missing entries are ``-1`` with an infinite distance.
+
+        The cells are searched in rings of growing radius around the cell of
+        each point, until its k-th distance is below the distance to the cells
+        not searched yet. Points still left once the searched square would hold
+        all the vehicles on average, e.g., in areas without any vehicle, are
+        compared with all the vehicles instead.
+        """
+        nearest = np.full((len(points), k), -1, dtype=np.intp)
+        distances = np.full((len(points), k), np.inf)
+        cell_coords = self._cell_coords(points)
+        active = np.arange(len(points))
+        for radius in range(max(self.shape)):
+            if not len(active):
+                break
+            ring = _ring(radius)
+            if (2 * radius + 1) ** 2 * self.vehicles_per_cell > len(self.points):
+                nearest[active], distances[active] = self._k_nearest_exhaustive(
+                    points[active], k
+                )
+                break
+            # The cells of the ring around each active point.
+            cells = cell_coords[active, np.newaxis, :] + ring
+            inside = np.all((cells >= 0) & (cells < self.shape), axis=-1)
+            owners, offsets = np.nonzero(inside)
+            cells = cells[owners, offsets]
+            cells = cells[:, 0] * self.shape[1] + cells[:, 1]
+
+            # One candidate per vehicle in each of those cells.
+            starts = self._cell_start[cells]
+            counts = self._cell_start[cells + 1] - starts
+            owners = np.repeat(active[owners], counts)
+            positions = np.arange(counts.sum()) + np.repeat(
+                starts - (np.cumsum(counts) - counts), counts
+            )
+            candidates = self._order[positions]
+            candidate_distances = np.linalg.norm(
+                points[owners] - self.points[candidates], axis=1
+            )
+
+            # Merge the candidates with the current k nearest of each point,
+            # leaving out the missing entries.
+            found = np.isfinite(distances[active])
+            owners = np.concatenate(
+                (owners, np.broadcast_to(active[:, np.newaxis], found.shape)[found])
+            )
+            candidates = np.concatenate((candidates, nearest[active][found]))
+            candidate_distances = np.concatenate(
+                (candidate_distances, distances[active][found])
+            )
+            # Sort by point, then by distance, with a single sort: the distances
+            # are scaled into [0, 0.5] and added to the point indices.
+            scale = 2.0 * candidate_distances.max(initial=1.0)
+            order = np.argsort(owners + candidate_distances / scale)
+            owners = owners[order]
+            positions = np.arange(len(owners)) - np.searchsorted(owners, owners)
+            kept = positions < k
+            nearest[owners[kept], positions[kept]] = candidates[order][kept]
+            distances[owners[kept], positions[kept]] = candidate_distances[order][kept]
+
+            unsearched_distance = self._unsearched_distance(
+                points[active], cell_coords[active], radius
+            )
+            active = active[distances[active, -1] > unsearched_distance]
+        return nearest, distances
+
+    def _unsearched_distance(
+        self, points: np.ndarray, cell_coords: np.ndarray, radius: int
+    ) -> np.ndarray:
+        """Lower bound of the distance from the points to the vehicles outside
+        the square of cells of the given radius around their cells.
+
+        Such a vehicle is beyond one of the sides of the square that is not on
+        the edge of the grid, so it is at least as far as that side.
+        """
+        lower_sides = self._lower + (cell_coords - radius) * self.cell_size
+        upper_sides = self._lower + (cell_coords + radius + 1) * self.cell_size
+        to_lower = np.where(cell_coords - radius > 0, points - lower_sides, np.inf)
+        to_upper = np.where(
+            cell_coords + radius < np.array(self.shape) - 1,
+            upper_sides - points,
+            np.inf,
+        )
+        return np.minimum(to_lower, to_upper).min(axis=1)
+
+    def _k_nearest_exhaustive(
+        self, points: np.ndarray, k: int
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Find the ``k`` nearest vehicles by comparing with all the vehicles."""
+        nearest = np.full((len(points), k), -1, dtype=np.intp)
+        distances = np.full((len(points), k), np.inf)
+        k = min(k, len(self.points))
+        # Bound the size of the distance matrix of each chunk of points.
+        chunk_size = max(1, EXHAUSTIVE_CHUNK // len(self.points))
+        for start in range(0, len(points), chunk_size):
+            chunk = slice(start, start + chunk_size)
+            chunk_distances = np.linalg.norm(
+                points[chunk, np.newaxis] - self.points[np.newaxis], axis=2
+            )
+            closest = np.argpartition(chunk_distances, k - 1, axis=1)[:, :k]
+            closest_distances = np.take_along_axis(chunk_distances, closest, axis=1)
+            order = np.argsort(closest_distances, axis=1)
+            nearest[chunk, :k] = np.take_along_axis(closest, order, axis=1)
+            distances[chunk, :k] = np.take_along_axis(closest_distances, order, axis=1)
+        return nearest, distances
@@ -0,0 +1,135 @@
+"""Greedy taxi commissioning on a spatial grid of the vehicles.
+
+Unlike the other algorithms, this one never builds the full vehicle-customer
+distance table: the nearest vehicles of each customer are looked up on a
+VehicleGrid, so large scenarios are solved in O(n log n).
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from .grid import VehicleGrid, project
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from models import assignment_cost, coordinates, ids
+
+STRATEGIES = ("nearest", "regret")
+
+# Number of nearest vehicles considered per customer when capacities are limited.
+N_CANDIDATES: int = 8
+
+
+def _assign_with_capacity(
+    vehicle_points: np.ndarray,
+    customer_points: np.ndarray,
+    order: np.ndarray,
+    candidates: np.ndarray,
+    capacity: int,
+) -> np.ndarray:
+    """Assign the customers in the given order, each to its nearest free taxi.
+
+    The nearest candidates of each customer are tried first. The customers
+    whose candidates are all full are deferred, and then compared with all the
+    taxis with capacity left.
+    """
+    remaining = [capacity] * len(vehicle_points)
+    assignment = np.empty(len(customer_points), dtype=np.intp)
+    deferred = []
+    for customer, customer_candidates in zip(
+        order.tolist(), candidates[order].tolist()
+    ):
+        for vehicle in customer_candidates:
+            if vehicle >= 0 and remaining[vehicle]:
+                remaining[vehicle] -= 1
+                assignment[customer] = vehicle
+                break
+        else:
+            deferred.append(customer)
+
+    open_vehicles = np.flatnonzero(remaining)
+    open_points = vehicle_points[open_vehicles]
+    for customer in deferred:
+        offsets = open_points - customer_points[customer]
+        nearest = int(np.argmin(np.einsum("ij,ij->i", offsets, offsets)))
+        vehicle = int(open_vehicles[nearest])
+        remaining[vehicle] -= 1
+        assignment[customer] = vehicle
+        if not remaining[vehicle]:
+            open_vehicles = np.delete(open_vehicles, nearest)
+            open_points = np.delete(open_points, nearest, axis=0)
+    return assignment
+
+
+def assign(
+    vehicle_coords: np.ndarray,
+    customer_coords: np.ndarray,
+    strategy: str = "nearest",
+    capacity: int | None = None,
+) -> np.ndarray:
+    """Return the (0-based) taxi assigned to each customer.
+
+    Without a ``capacity``, every customer gets its nearest taxi, which
+    minimizes both the total distance and the waiting time. Otherwise each taxi
+    serves at most ``capacity`` customers, and the customers get their nearest
+    taxi with capacity left: in the order of the request with the "nearest"
+    strategy, or with the "regret" strategy, first the customers that would
+    lose the most if their nearest taxi were taken.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(
+            f"unknown strategy {strategy!r}, expected one of {STRATEGIES}."
+        )
+    if not len(customer_coords):
+        return np.empty(0, dtype=np.intp)
+    if not len(vehicle_coords):
+        raise ValueError("there must be at least one vehicle.")
+    if capacity is not None and capacity * len(vehicle_coords) < len(customer_coords):
+        raise ValueError("the vehicles do not have enough capacity for all customers.")
+
+    reference_latitude = vehicle_coords[:, 0].mean()
+    vehicle_points = project(vehicle_coords, reference_latitude)
+    customer_points = project(customer_coords, reference_latitude)
+    if capacity is None:
+        nearest, _ = VehicleGrid(vehicle_points).k_nearest(customer_points, 1)
+        return nearest[:, 0]
+
+    candidates, distances = VehicleGrid(vehicle_points).k_nearest(
+        customer_points, N_CANDIDATES
+    )
+    if strategy == "regret" and len(vehicle_points) > 1:
+        regret = distances[:, 1] - distances[:, 0]
+        order = np.argsort(-regret, kind="stable")
+    else:
+        order = np.arange(len(customer_points))
+    return _assign_with_capacity(
+        vehicle_points, customer_points, order, candidates, capacity
+    )
+
+
+def solve(
+    vehicles: list[dict],
+    customers: list[dict],
+    strategy: str = "nearest",
+    capacity: int | None = None,
+) -> tuple[list[tuple[str, str]], tuple[float, float]]:
+    """Solve a taxi commission greedily, see assign().
+
+    Returns the allocation with the real ids and its total distance and waiting
+    time, like the other algorithms.
+    """
+    vehicle_coords = coordinates(vehicles)
+    customer_coords = coordinates(customers)
+    assignment = assign(vehicle_coords, customer_coords, strategy, capacity)
+    vehicle_ids = ids(vehicles)
+    solution = [
+        (vehicle_ids[vehicle], customer_id)
+        for vehicle, customer_id in zip(assignment.tolist(), ids(customers))
+    ]
+    return solution, assignment_cost(
+        vehicle_coords,
+        customer_coords,
+        coordinates(customers, "destinationX", "destinationY"),
+        assignment,
+    )
@@ -1,79 +1,324 @@
-import math
+from collections.abc import Sequence
+
+import numpy as np
+
+from distance_cache import DistanceCache
 
 ASSUMED_SPEED: float = 4.2
 assert ASSUMED_SPEED > 0, "the assumed speed must be greater than 0."
 
 
+def evaluate_genes(
+    pickup_distances: np.ndarray,
+    trip_distances: np.ndarray,
+    vehicle_idx: np.ndarray,
+    customer_idx: np.ndarray,
+) -> np.ndarray:
+    """Calculate the costs of many individuals at once.
+
+    The index arrays have shape (n_individuals, n_genes) and are 0-based. Returns
+    an array of shape (n_individuals, 2) with the total distance and the total
+    waiting time of each individual.
+    """
+    pickup_distance = pickup_distances[vehicle_idx, customer_idx].sum(axis=-1)
+    travel_distance = trip_distances[customer_idx].sum(axis=-1)
+    return np.stack(
+        (pickup_distance + travel_distance, pickup_distance / ASSUMED_SPEED), axis=-1
+    )
+
+
+def evaluate_gene_costs(
+    pickup_distances: np.ndarray,
+    trip_distances: np.ndarray,
+    vehicle_idx: np.ndarray,
+    customer_idx: np.ndarray,
+) -> np.ndarray:
+    """Calculate the contribution of each gene to the costs.
+
+    The index arrays are 0-based and of any (matching) shape. Returns an array
+    with one more trailing axis holding the distance and the waiting time of each
+    gene, which add up to the costs given by evaluate_genes().
+    """
+    pickup_distance = pickup_distances[vehicle_idx, customer_idx]
+    return np.stack(
+        (
+            pickup_distance + trip_distances[customer_idx],
+            pickup_distance / ASSUMED_SPEED,
+        ),
+        axis=-1,
+    )
+
+
+def k_nearest_vehicles(pickup_distances: np.ndarray, k: int) -> np.ndarray:
+    """Return the (0-based) indices of the ``k`` nearest vehicles to each customer.
+
+    The result has shape (n_customers, k), sorted from the nearest vehicle. ``k``
+    is capped at the number of vehicles.
+    """
+    k = min(k, len(pickup_distances))
+    nearest = np.argpartition(pickup_distances, k - 1, axis=0)[:k].T
+    order = np.argsort(
+        np.take_along_axis(pickup_distances.T, nearest, axis=1), axis=1, kind="stable"
+    )
+    return np.take_along_axis(nearest, order, axis=1)
+
+
+class Records(Sequence):
+    """Vehicles or customers stored column by column.
+
+    Indexing gives the same dicts as the parsed JSON, but coordinates() and
+    ids() read the columns directly, so large scenarios never go through one
+    dict per vehicle or customer.
+    """
+
+    def __init__(self, ids: list[str], columns: dict[str, np.ndarray]):
+        self.ids = ids
+        self.columns = columns
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        item = {name: float(column[index]) for name, column in self.columns.items()}
+        item["id"] = self.ids[index]
+        return item
+
+    def take(self, indices: np.ndarray) -> "Records":
+        """Return the records at the given indices."""
+        return Records(
+            [self.ids[i] for i in indices.tolist()],
+            {name: column[indices] for name, column in self.columns.items()},
+        )
+
+
+def coordinates(items: list[dict], x: str = "coordX", y: str = "coordY") -> np.ndarray:
+    """Stack the coordinates of vehicles or customers into an (n, 2) array."""
+    if isinstance(items, Records):
+        return np.column_stack((items.columns[x], items.columns[y])).astype(
+            np.float64, copy=False
+        )
+    return np.array([(item[x], item[y]) for item in items], dtype=np.float64).reshape(
+        -1, 2
+    )
+
+
+def ids(items: list[dict]) -> list[str]:
+    """Return the ids of vehicles or customers."""
+    if isinstance(items, Records):
+        return items.ids
+    return [item["id"] for item in items]
+
+
+def pickup_distance_table(
+    vehicle_coords: np.ndarray, customer_origins: np.ndarray
+) -> np.ndarray:
+    """Calculate the distance from each vehicle (rows) to each customer (columns)."""
+    return Scenario._haversine_distance(
+        vehicle_coords[:, 0, np.newaxis],
+        vehicle_coords[:, 1, np.newaxis],
+        customer_origins[np.newaxis, :, 0],
+        customer_origins[np.newaxis, :, 1],
+    )
+
+
+def trip_distance_array(
+    customer_origins: np.ndarray, customer_destinations: np.ndarray
+) -> np.ndarray:
+    """Calculate the distance from each customer origin to its destination."""
+    return Scenario._haversine_distance(
+        customer_origins[:, 0],
+        customer_origins[:, 1],
+        customer_destinations[:, 0],
+        customer_destinations[:, 1],
+    )
+
+
+def assignment_costs(
+    vehicle_coords: np.ndarray,
+    customer_origins: np.ndarray,
+    customer_destinations: np.ndarray,
+    assignments: np.ndarray,
+) -> np.ndarray:
+    """Calculate the costs of many assignments without the full distance tables.
+
+    ``assignments`` has shape (n_assignments, n_customers) and holds the 0-based
+    vehicle of each customer, so only the distances of the chosen pairs are
+    computed. Returns an array of shape (n_assignments, 2) with the total
+    distance and the total waiting time of each assignment.
+    """
+    pickup_distance = Scenario._haversine_distance(
+        vehicle_coords[assignments, 0],
+        vehicle_coords[assignments, 1],
+        customer_origins[:, 0],
+        customer_origins[:, 1],
+    ).sum(axis=-1)
+    trip_distance = trip_distance_array(customer_origins, customer_destinations).sum()
+    return np.stack(
+        (pickup_distance + trip_distance, pickup_distance / ASSUMED_SPEED), axis=-1
+    )
+
+
+def assignment_cost(
+    vehicle_coords: np.ndarray,
+    customer_origins: np.ndarray,
+    customer_destinations: np.ndarray,
+    assignment: np.ndarray,
+) -> tuple[float, float]:
+    """Calculate the costs of a single assignment, see assignment_costs()."""
+    costs = assignment_costs(
+        vehicle_coords, customer_origins, customer_destinations, assignment[np.newaxis]
+    )
+    return tuple(costs[0].tolist())
+
+
+def individuals_to_arrays(
+    individuals: list[list[tuple[int, int]]],
+) -> tuple[np.ndarray, np.ndarray]:
+    """Stack individuals into 0-based vehicle and customer index arrays."""
+    # Stack all the genes into a (n_individuals, n_genes, 2) array.
+    genes = np.asarray(individuals, dtype=np.intp) - 1
+    return genes[:, :, 0], genes[:, :, 1]
+
+
 class Scenario:
-    def __init__(self, vehicles: dict, customers: dict):
+    def __init__(
+        self,
+        vehicles: dict,
+        customers: dict,
+        distance_cache: DistanceCache | None = None,
+    ):
         self.vehicles = vehicles
         self.customers = customers
-        # Mapping from vehicles int ids to vehicles.
-        self.indexed_vehicles = dict(enumerate(vehicles, start=1))
-        self.indexed_customers = dict(enumerate(customers, start=1))
+        # Real ids of the vehicles and customers, by 0-based index.
+        self.vehicle_ids = ids(vehicles)
+        self.customer_ids = ids(customers)
 
-    def calculate_cost(self, individual: list[tuple[int, int]]):
-        total_distance: float = 0.0
-        total_waiting_time: float = 0.0  # time a customer is waiting
-        for gen in individual:
-            # Get vehicle position.
-            vehicle = self.indexed_vehicles[gen[0]]
-            vehicle_x, vehicle_y = vehicle["coordX"], vehicle["coordY"]
-
-            # Get customer position.
-            customer = self.indexed_customers[gen[1]]
-            customer_origin_x, customer_origin_y = (
-                customer["coordX"],
-                customer["coordY"],
-            )
-            customer_destination_x, customer_destination_y = (
-                customer["destinationX"],
-                customer["destinationY"],
-            )
-            # Distance from taxi to customer.
-            pickup_distance = Scenario._haversine_distance(
-                vehicle_x, vehicle_y, customer_origin_x, customer_origin_y
+        # Coordinates never change during a solve, so all the distances are
+        # computed once here and the cost evaluation becomes a table lookup.
+        # With a distance_cache.DistanceCache, the tables computed for the same
+        # coordinates before are read from disk instead.
+        vehicle_coords = coordinates(vehicles)
+        customer_origins = coordinates(customers)
+        customer_destinations = coordinates(customers, "destinationX", "destinationY")
+
+        def pickup_distances():
+            return pickup_distance_table(vehicle_coords, customer_origins)
+
+        def trip_distances():
+            return trip_distance_array(customer_origins, customer_destinations)
+
+        if distance_cache is None:
+            self.pickup_distances = pickup_distances()
+            self.trip_distances = trip_distances()
+        else:
+            # The tables are cached in tiles of customers, per fleet.
+            self.pickup_distances = distance_cache.get(
+                "pickup",
+                vehicle_coords,
+                customer_origins,
+                lambda columns: pickup_distance_table(
+                    vehicle_coords, customer_origins[columns]
+                ),
             )
-            # Distance from customer origin to destination.
-            travel_distance = Scenario._haversine_distance(
-                customer_origin_x,
-                customer_origin_y,
-                customer_destination_x,
-                customer_destination_y,
+            self.trip_distances = distance_cache.get(
+                "trip",
+                None,
+                np.hstack((customer_origins, customer_destinations)),
+                lambda columns: trip_distance_array(
+                    customer_origins[columns], customer_destinations[columns]
+                ),
             )
-            total_distance += pickup_distance + travel_distance
-            # Waiting times.
-            waiting_time = pickup_distance / ASSUMED_SPEED
-            total_waiting_time += waiting_time
-        return total_distance, total_waiting_time
+
+    def calculate_cost(self, individual: list[tuple[int, int]]):
+        # Genes use 1-based ids, the distance tables are 0-based.
+        genes = np.asarray(individual, dtype=np.intp).reshape(-1, 2) - 1
+        total_distance, total_waiting_time = evaluate_genes(
+            self.pickup_distances, self.trip_distances, genes[:, 0], genes[:, 1]
+        )
+        return float(total_distance), float(total_waiting_time)
+
+    def calculate_costs(self, individuals: list[list[tuple[int, int]]]) -> np.ndarray:
+        """Calculate the costs of a whole batch of individuals in one call."""
+        if not individuals:
+            return np.empty((0, 2))
+        return evaluate_genes(
+            self.pickup_distances,
+            self.trip_distances,
+            *individuals_to_arrays(individuals),
+        )
+
+    def nearest_vehicles(self) -> np.ndarray:
+        """Return the (0-based) index of the nearest vehicle to each customer."""
+        return self.pickup_distances.argmin(axis=0)
+
+    def k_nearest_vehicles(self, k: int) -> np.ndarray:
+        """Return the (0-based) indices of the k nearest vehicles to each customer."""
+        return k_nearest_vehicles(self.pickup_distances, k)
+
+    def allocated_vehicles(self, allocation: list[tuple[str, str]]) -> np.ndarray:
+        """Return the (0-based) index of the vehicle of each customer in an allocation.
+
+        The allocation is given with the real ids, e.g., a previous solution of
+        the scenario before it changed. Customers that are not in it, or whose
+        vehicle is not in the scenario anymore, get their nearest vehicle.
+        """
+        vehicles = self.nearest_vehicles()
+        vehicle_indices = {v: i for i, v in enumerate(self.vehicle_ids)}
+        customer_indices = {c: i for i, c in enumerate(self.customer_ids)}
+        for vehicle_id, customer_id in allocation:
+            vehicle = vehicle_indices.get(vehicle_id)
+            customer = customer_indices.get(customer_id)
+            if vehicle is not None and customer is not None:
+                vehicles[customer] = vehicle
+        return vehicles
+
+    def calculate_gene_costs(self, genes: list[tuple[int, int]]) -> np.ndarray:
+        """Calculate the distance and waiting time contributed by each gene."""
+        genes = np.asarray(genes, dtype=np.intp).reshape(-1, 2) - 1
+        return evaluate_gene_costs(
+            self.pickup_distances, self.trip_distances, genes[:, 0], genes[:, 1]
+        )
+
+    def calculate_cost_incremental(self, individual) -> tuple[float, float]:
+        """Calculate the costs of an individual that tracks its gene costs.
+
+        The first time, the costs of all the genes are stored in the individual as
+        ``gene_costs``, and their sum as ``total_cost``. Afterwards, the genetic
+        operators keep both up to date for the genes they change, so the costs
+        are read without touching the rest of the genes.
+        """
+        if getattr(individual, "gene_costs", None) is None:
+            individual.gene_costs = self.calculate_gene_costs(individual)
+            individual.total_cost = individual.gene_costs.sum(axis=0)
+        return tuple(individual.total_cost.tolist())
 
     @classmethod
-    def _haversine_distance(cls, lat1, lon1, lat2, lon2) -> float:
-        """Calculate the total distance between start point and customer."""
+    def _haversine_distance(cls, lat1, lon1, lat2, lon2):
+        """Calculate the total distance between start point and customer.
+
+        Accepts scalars or NumPy arrays, which are broadcast against each other.
+        """
         R = 6371  # Radius of earth in kilometers. Use 3956 for miles. Determines return value units.
 
         # Convert to radians.
-        lon1, lat1, lon2, lat2 = map(math.radians, [lon1, lat1, lon2, lat2])
+        lon1, lat1, lon2, lat2 = map(np.radians, [lon1, lat1, lon2, lat2])
 
         # Haversine formula.
         dlon = lon2 - lon1
         dlat = lat2 - lat1
-        a = (
-            math.sin(dlat / 2) ** 2
-            + math.cos(lat1) * math.cos(lat2) * math.sin(dlon / 2) ** 2
-        )
-        c = 2 * math.asin(math.sqrt(a))
+        a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+        c = 2 * np.arcsin(np.sqrt(a))
         return c * R
 
     def solution_to_real_ids(
         self, solution: list[tuple[int, int]]
     ) -> list[tuple[str, str]]:
+        # Genes use 1-based ids.
         real_ids_sol = []
         for vehicle, customer in solution:
             real_ids_sol.append(
-                (
-                    self.indexed_vehicles[vehicle]["id"],
-                    self.indexed_customers[customer]["id"],
-                )
+                (self.vehicle_ids[vehicle - 1], self.customer_ids[customer - 1])
             )
         return real_ids_sol
@@ -4,8 +4,30 @@ import random
 import sys
 from pathlib import Path
 
+import numpy as np
+
 sys.path.insert(0, str(Path(__file__).parent.parent))
-from models import Scenario
+from distance_cache import DistanceCache
+from models import (
+    ASSUMED_SPEED,
+    Scenario,
+    assignment_costs,
+    coordinates,
+    evaluate_genes,
+    pickup_distance_table,
+    trip_distance_array,
+)
+
+# Maximum number of genes evaluated, or distances computed, at once.
+SAMPLE_CHUNK: int = 1 << 20
+
+
+def _coordinates(vehicles, customers):
+    return (
+        coordinates(vehicles),
+        coordinates(customers),
+        coordinates(customers, "destinationX", "destinationY"),
+    )
 
 
 def solve(
@@ -15,9 +37,95 @@ def solve(
     """Solve a taxi commission with random allocations."""
     scenario = Scenario(vehicles, customers)
     solution = []
-    vehicles_idx = list(scenario.indexed_vehicles)
-    customers_idx = list(scenario.indexed_customers)
+    vehicles_idx = list(range(1, len(vehicles) + 1))
+    customers_idx = list(range(1, len(customers) + 1))
     random.shuffle(customers_idx)
     for customer in customers_idx:
         solution.append((random.choice(vehicles_idx), customer))
     return scenario.solution_to_real_ids(solution), scenario.calculate_cost(solution)
+
+
+def expected_cost(
+    vehicles: list[dict],
+    customers: list[dict],
+    distance_cache: DistanceCache | None = None,
+    scenario: Scenario | None = None,
+) -> tuple[float, float]:
+    """Calculate the expected costs of random allocations, without sampling.
+
+    When each customer gets a uniformly random taxi, its expected pickup distance
+    is its mean distance to all the taxis, so the expected total distance and
+    waiting time follow from a single reduction of the pickup distances.
+
+    The distance tables are taken from ``scenario``, if given, or from the
+    ``distance_cache``. Otherwise, the pickup distances are computed a chunk of
+    customers at a time and never stored as a whole table.
+    """
+    if customers and not vehicles:
+        raise ValueError("there must be at least one vehicle.")
+    if scenario is None and distance_cache is not None:
+        scenario = Scenario(vehicles, customers, distance_cache)
+    if scenario is not None:
+        pickup_distance = (
+            scenario.pickup_distances.mean(axis=0).sum() if vehicles else 0.0
+        )
+        trip_distance = scenario.trip_distances.sum()
+    else:
+        vehicle_coords, origins, destinations = _coordinates(vehicles, customers)
+        chunk_size = max(1, SAMPLE_CHUNK // max(len(vehicles), 1))
+        pickup_distance = sum(
+            pickup_distance_table(
+                vehicle_coords, origins[start : start + chunk_size]
+            ).sum()
+            for start in range(0, len(customers), chunk_size)
+        ) / max(len(vehicles), 1)
+        trip_distance = trip_distance_array(origins, destinations).sum()
+    total_distance = pickup_distance + trip_distance
+    return float(total_distance), float(pickup_distance / ASSUMED_SPEED)
+
+
+def sample_costs(
+    vehicles: list[dict],
+    customers: list[dict],
+    n_samples: int,
+    random_seed: int | None = None,
+    distance_cache: DistanceCache | None = None,
+    scenario: Scenario | None = None,
+) -> np.ndarray:
+    """Calculate the costs of ``n_samples`` random allocations.
+
+    The allocations are drawn and evaluated as batches of index arrays. Returns
+    an array of shape (n_samples, 2) with the total distance and the total
+    waiting time of each allocation. The distance tables are taken from
+    ``scenario`` or the ``distance_cache``, if given, as in expected_cost();
+    otherwise, only the distances of the sampled pairs are computed.
+    """
+    if n_samples < 1:
+        raise ValueError("at least one allocation must be sampled.")
+    if customers and not vehicles:
+        raise ValueError("there must be at least one vehicle.")
+    if scenario is None and distance_cache is not None:
+        scenario = Scenario(vehicles, customers, distance_cache)
+    if scenario is None:
+        coords = _coordinates(vehicles, customers)
+    rng = np.random.default_rng(random_seed)
+    num_taxis, num_customers = len(vehicles), len(customers)
+    # The order of the customers does not change the costs.
+    customer_idx = np.arange(num_customers)
+    chunk_size = max(1, SAMPLE_CHUNK // max(num_customers, 1))
+    costs = []
+    for start in range(0, n_samples, chunk_size):
+        n = min(chunk_size, n_samples - start)
+        vehicle_idx = rng.integers(0, max(num_taxis, 1), size=(n, num_customers))
+        if scenario is None:
+            costs.append(assignment_costs(*coords, vehicle_idx))
+            continue
+        costs.append(
+            evaluate_genes(
+                scenario.pickup_distances,
+                scenario.trip_distances,
+                vehicle_idx,
+                np.broadcast_to(customer_idx, (n, num_customers)),
+            )
+        )
+    return np.concatenate(costs)
@@ -1,7 +1,13 @@
 """High-level solver for taxi commissioning."""
 
 import importlib
+import threading
 import time
+from functools import partial
+
+# Fraction of the genetic population seeded from the previous allocation when
+# re-solving a scenario that changed.
+WARM_START_FRACTION = 0.5
 
 
 def _wrangle_solution(solution: list[tuple[str, str]]):
@@ -16,41 +22,271 @@ def _wrangle_solution(solution: list[tuple[str, str]]):
     return wrangled_solution
 
 
-def solve(
-    vehicles: list[dict],
-    customers: list[dict],
-) -> dict:
-    random_sol = importlib.import_module(".random_.solution", package="algos")
-    genetic_sol = importlib.import_module(".genetic.solution", package="algos")
-    start_time = time.perf_counter()
-    random_sol, random_stats = random_sol.solve(vehicles, customers)
-    elapsed_seconds_random = time.perf_counter() - start_time
-
-    start_time = time.perf_counter()
-    genetic_sol, genetic_stats = genetic_sol.solve(
-        vehicles, customers, max_generations=(len(vehicles) + len(customers)) * 2
-    )
-    elapsed_seconds_genetic = time.perf_counter() - start_time
-
-    return {
-        "random": {
-            "allocation": _wrangle_solution(random_sol),
-            "stats": {
-                "total_distance": random_stats[0],
-                "estimated_total_waiting_time": random_stats[1],
+def _unwrangle_solution(wrangled_solution: dict[str, list[str]]):
+    """Change a solution in the output format back to (vehicle, customer) pairs."""
+    return [
+        (vehicle, customer)
+        for vehicle, customers in wrangled_solution.items()
+        for customer in customers
+    ]
+
+
+class SolverEngine:
+    """Solve scenarios with the random, greedy and genetic algorithms.
+
+    The solver modules and the genetic toolbox are set up once, when the engine
+    is created, and reused by every call to solve(). With a ``distance_cache``
+    (see distance_cache.DistanceCache), the distance tables of the scenarios are
+    stored on disk and read back by the later solves of the same coordinates.
+    """
+
+    def __init__(self, distance_cache=None):
+        self._distance_cache = distance_cache
+        self._random_solution = importlib.import_module(
+            ".random_.solution", package="algos"
+        )
+        self._greedy_solution = importlib.import_module(
+            ".greedy.solution", package="algos"
+        )
+        genetic_solution = importlib.import_module(".genetic.solution", package="algos")
+        self._reporting = importlib.import_module(".genetic.reporting", package="algos")
+        self._phase_profile = importlib.import_module(
+            ".genetic.utils", package="algos"
+        ).PhaseProfile
+        self._decomposition = importlib.import_module(".decomposition", package="algos")
+        self._scenario = importlib.import_module(".models", package="algos").Scenario
+        self._genetic_engine = genetic_solution.GeneticEngine()
+
+    def solve(
+        self,
+        vehicles: list[dict],
+        customers: list[dict],
+        max_seconds: float | None = None,
+        stagnation_generations: int | None = None,
+        stagnation_epsilon: float = 0.0,
+        include_history: bool = False,
+        random_samples: int | None = None,
+        initial_allocation: dict[str, list[str]] | None = None,
+        n_clusters: int | None = None,
+        n_workers: int | None = None,
+        profile: bool = False,
+        cancel_event: threading.Event | None = None,
+        progress=None,
+        progress_generations: int | None = None,
+        progress_seconds: float | None = None,
+    ) -> dict:
+        """Solve the scenario with the random, greedy and genetic algorithms.
+
+        The genetic algorithm stops after ``max_seconds`` or after
+        ``stagnation_generations`` generations without an improvement larger
+        than ``stagnation_epsilon``, if given, and at the latest after twice as
+        many generations as vehicles and customers.
+
+        With ``include_history``, the convergence history of the genetic
+        algorithm is included in the response, one list per column.
+
+        The random baseline is the expected cost of allocating each customer to a
+        uniformly random taxi, computed in closed form. With ``random_samples``,
+        it is the mean cost of that many random allocations instead, along with
+        their standard deviation.
+
+        With an ``initial_allocation`` in the format of the response, such as the
+        allocation of the scenario before some vehicles moved or customers came
+        and went, the genetic algorithm is warm-started: a WARM_START_FRACTION of
+        its population is seeded from that allocation and random variants of it.
+
+        With ``n_clusters``, large scenarios are decomposed geographically: the
+        genetic algorithm solves that many clusters of customers and vehicles
+        independently, in a pool of ``n_workers`` processes, and the allocations
+        are stitched together (see decomposition.solve()); the full distance tables
+        are never computed, not even for the random baseline. The response then also
+        lists the ``clusters`` and the number of customers ``repaired`` across
+        their boundaries, and the genetic algorithm reports its progress only
+        once, at the end.
+
+        With ``profile``, the response includes the ``profile`` of the genetic
+        algorithm: the seconds and calls of each phase of its loop, added up over
+        the clusters, if any, and per generation too with ``include_history`` (see
+        genetic.utils.PhaseProfile).
+
+        Setting ``cancel_event`` stops the genetic algorithm early, see
+        genetic.solution.GeneticEngine.solve().
+
+        If given, ``progress`` is called with the best allocation found so far, in
+        a dictionary like the entries of the response, plus the ``algorithm`` that
+        found it and the ``generation`` of the genetic algorithm. The greedy
+        allocation is reported first; afterwards, the genetic algorithm reports
+        its best allocation every ``progress_generations`` generations or
+        ``progress_seconds`` seconds, whenever it changed, even if the greedy one
+        is better. An allocation is never reported twice by the same algorithm.
+        """
+        last_reported = {}
+
+        def report(algorithm, generation, allocation, stats):
+            if progress is None or last_reported.get(algorithm) == tuple(stats):
+                return
+            last_reported[algorithm] = tuple(stats)
+            progress(
+                {
+                    "algorithm": algorithm,
+                    "generation": generation,
+                    "allocation": _wrangle_solution(allocation),
+                    "stats": {
+                        "total_distance": stats[0],
+                        "estimated_total_waiting_time": stats[1],
+                    },
+                }
+            )
+
+        start_time = time.perf_counter()
+        # The distance tables are computed once, for the random baseline and the
+        # genetic algorithm. Decomposed scenarios never get the full tables: the
+        # clusters have their own, and the baseline is computed without.
+        scenario = None
+        if n_clusters is None:
+            scenario = self._scenario(vehicles, customers, self._distance_cache)
+        if random_samples is None:
+            random_stats = self._random_solution.expected_cost(
+                vehicles, customers, scenario=scenario
+            )
+            random_info = {"method": "expected"}
+        else:
+            random_costs = self._random_solution.sample_costs(
+                vehicles, customers, random_samples, scenario=scenario
+            )
+            random_stats = tuple(random_costs.mean(axis=0).tolist())
+            random_std = random_costs.std(axis=0).tolist()
+            random_info = {
+                "method": "sampled",
+                "samples": random_samples,
+                "std": {
+                    "total_distance": random_std[0],
+                    "estimated_total_waiting_time": random_std[1],
+                },
+            }
+        elapsed_seconds_random = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        greedy_sol, greedy_stats = self._greedy_solution.solve(vehicles, customers)
+        elapsed_seconds_greedy = time.perf_counter() - start_time
+        report("greedy", None, greedy_sol, greedy_stats)
+
+        warm_start = {}
+        if initial_allocation is not None:
+            warm_start = {
+                "seed_fraction": WARM_START_FRACTION,
+                "initial_allocation": _unwrangle_solution(initial_allocation),
+            }
+        genetic_settings = dict(
+            max_generations=(len(vehicles) + len(customers)) * 2,
+            max_seconds=max_seconds,
+            stagnation_generations=stagnation_generations,
+            stagnation_epsilon=stagnation_epsilon,
+            profile=profile,
+            profile_generations=include_history,
+            distance_cache=self._distance_cache,
+            **warm_start,
+        )
+        start_time = time.perf_counter()
+        if n_clusters is not None:
+            genetic_sol, genetic_stats, genetic_info = self._decomposition.solve(
+                vehicles,
+                customers,
+                n_clusters,
+                n_workers=n_workers,
+                cancel_event=cancel_event,
+                **genetic_settings,
+            )
+            report("genetic", genetic_info["generations"], genetic_sol, genetic_stats)
+        else:
+            genetic_sol, genetic_stats, genetic_info = self._genetic_engine.solve(
+                vehicles,
+                customers,
+                **genetic_settings,
+                scenario=scenario,
+                cancel_event=cancel_event,
+                progress=(partial(report, "genetic") if progress is not None else None),
+                progress_generations=progress_generations,
+                progress_seconds=progress_seconds,
+            )
+        elapsed_seconds_genetic = time.perf_counter() - start_time
+
+        solution = {
+            "random": {
+                "stats": {
+                    "total_distance": random_stats[0],
+                    "estimated_total_waiting_time": random_stats[1],
+                },
+                "elapsed_seconds": elapsed_seconds_random,
+                **random_info,
             },
-            "elapsed_seconds": elapsed_seconds_random,
-        },
-        "genetic": {
-            "allocation": _wrangle_solution(genetic_sol),
-            "stats": {
-                "total_distance": genetic_stats[0],
-                "estimated_total_waiting_time": genetic_stats[1],
+            "greedy": {
+                "allocation": _wrangle_solution(greedy_sol),
+                "stats": {
+                    "total_distance": greedy_stats[0],
+                    "estimated_total_waiting_time": greedy_stats[1],
+                },
+                "elapsed_seconds": elapsed_seconds_greedy,
             },
-            "elapsed_seconds": elapsed_seconds_genetic,
-        },
-        "saving_rates": {
-            "total_distance": 1.0 - (genetic_stats[0] / random_stats[0]),
-            "total_waiting_time": 1.0 - (genetic_stats[1] / random_stats[1]),
-        },
-    }
+            "genetic": {
+                "allocation": _wrangle_solution(genetic_sol),
+                "stats": {
+                    "total_distance": genetic_stats[0],
+                    "estimated_total_waiting_time": genetic_stats[1],
+                },
+                "elapsed_seconds": elapsed_seconds_genetic,
+                "generations": genetic_info["generations"],
+                "termination_reason": genetic_info["termination_reason"],
+            },
+            "saving_rates": {
+                "total_distance": 1.0 - (genetic_stats[0] / random_stats[0]),
+                "total_waiting_time": 1.0 - (genetic_stats[1] / random_stats[1]),
+            },
+        }
+        if n_clusters is not None:
+            clusters = []
+            for cluster in genetic_info["clusters"]:
+                entry = {
+                    "vehicles": cluster["vehicles"],
+                    "customers": cluster["customers"],
+                    "generations": cluster.get("generations", 0),
+                    "termination_reason": cluster["termination_reason"],
+                }
+                if include_history and "history" in cluster:
+                    entry["history"] = self._reporting.history_to_json(
+                        cluster["history"]
+                    )
+                clusters.append(entry)
+            solution["genetic"]["clusters"] = clusters
+            solution["genetic"]["repaired"] = genetic_info["repaired"]
+        elif include_history:
+            solution["genetic"]["history"] = self._reporting.history_to_json(
+                genetic_info["history"]
+            )
+        if profile:
+            phase_profile = genetic_info.get("profile")
+            if n_clusters is not None:
+                profiles = [
+                    cluster["profile"]
+                    for cluster in genetic_info["clusters"]
+                    if "profile" in cluster
+                ]
+                # The clusters run side by side, so their generations line up.
+                phase_profile = profiles[0] if profiles else self._phase_profile()
+                for cluster_profile in profiles[1:]:
+                    phase_profile.merge(cluster_profile)
+            solution["genetic"]["profile"] = phase_profile.summary(
+                per_generation=include_history
+            )
+        return solution
+
+
+_default_engine = None
+
+
+def solve(vehicles: list[dict], customers: list[dict], **kwargs) -> dict:
+    """Solve the scenario with a shared SolverEngine, see SolverEngine.solve()."""
+    global _default_engine
+    if _default_engine is None:
+        _default_engine = SolverEngine()
+    return _default_engine.solve(vehicles, customers, **kwargs)
@@ -0,0 +1,264 @@
+"""Benchmark the algorithms on synthetic scenarios of increasing size.
+
+Every algorithm runs on every size in a fresh process, so its peak memory is
+measured on its own. The results are written to a JSON file, with the wall
+time, the evaluations per second, the peak RSS and the quality over time of
+each run.
+
+    python benchmark.py --sizes 10x50 200x2000 --max-seconds 5 -o results.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+from algos import solver
+from genetic import solution as genetic_sol
+from greedy import solution as greedy_sol
+from random_ import solution as random_sol
+from synthetic import munich_scenario
+
+# Scenario sizes benchmarked by default, as (vehicles, customers).
+SIZES = ((10, 50), (50, 500), (200, 2_000), (500, 10_000), (2_000, 50_000))
+
+# The algorithms which build the full vehicle-customer distance tables are
+# skipped when these would have more entries than this.
+MAX_TABLE_ENTRIES: int = 20_000_000
+
+# Random allocations sampled by the "random_sampled" algorithm.
+RANDOM_SAMPLES: int = 1_000
+
+# Worker processes evaluating the fitness for the "genetic_array_parallel"
+# algorithm, one per core. With a single core, it runs like "genetic_array".
+PARALLEL_WORKERS: int = os.cpu_count() or 1
+
+# Customers per cluster of the "decomposed" algorithm.
+CLUSTER_CUSTOMERS: int = 1_000
+
+
+def _random(vehicles, customers, max_seconds, quality):
+    quality(random_sol.expected_cost(vehicles, customers))
+    return 1
+
+
+def _random_sampled(vehicles, customers, max_seconds, quality):
+    costs = random_sol.sample_costs(vehicles, customers, RANDOM_SAMPLES, 0)
+    quality(tuple(costs.mean(axis=0).tolist()))
+    return RANDOM_SAMPLES
+
+
+def _greedy(vehicles, customers, max_seconds, quality):
+    _, fitness_values = greedy_sol.solve(vehicles, customers)
+    quality(fitness_values)
+    return 1
+
+
+def _genetic(**kwargs):
+    def run(vehicles, customers, max_seconds, quality):
+        _, fitness_values, info = genetic_sol.solve(
+            vehicles,
+            customers,
+            max_seconds=max_seconds,
+            progress=lambda gen, solution, fitness_values: quality(fitness_values),
+            progress_seconds=max_seconds / 50,
+            **kwargs,
+        )
+        quality(fitness_values)
+        return int(info["history"][:, 1].sum())
+
+    return run
+
+
+def _decomposed(vehicles, customers, max_seconds, quality):
+    # The whole solve of the service, with the random and greedy baselines.
+    response = solver.solve(
+        vehicles,
+        customers,
+        max_seconds=max_seconds,
+        n_clusters=max(1, len(customers) // CLUSTER_CUSTOMERS),
+        include_history=True,
+    )
+    stats = response["genetic"]["stats"]
+    quality((stats["total_distance"], stats["estimated_total_waiting_time"]))
+    return sum(
+        int(sum(cluster["history"]["nevals"]))
+        for cluster in response["genetic"]["clusters"]
+        if "history" in cluster
+    )
+
+
+# Each algorithm gets the scenario, a time budget and a callback to record the
+# fitness values of its best solution so far, and returns how many allocations
+# it evaluated.
+ALGORITHMS = {
+    "random": (_random, True),
+    "random_sampled": (_random_sampled, True),
+    "greedy": (_greedy, False),
+    "genetic": (_genetic(), True),
+    "genetic_array": (_genetic(representation="array", neighbourhood_size=5), True),
+    "genetic_array_parallel": (
+        _genetic(
+            representation="array", neighbourhood_size=5, n_workers=PARALLEL_WORKERS
+        ),
+        True,
+    ),
+    "decomposed": (_decomposed, False),
+}
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere.
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def _run(
+    algorithm: str, num_vehicles: int, num_customers: int, seed: int, max_seconds: float
+) -> dict:
+    """Run one algorithm on one scenario; called in a fresh process."""
+    scenario = munich_scenario(num_vehicles, num_customers, seed)
+    baseline_rss_mb = _peak_rss_mb()
+    quality = []
+    start = time.perf_counter()
+
+    def record(fitness_values):
+        quality.append([time.perf_counter() - start, *map(float, fitness_values)])
+
+    run, _ = ALGORITHMS[algorithm]
+    evaluations = run(scenario["vehicles"], scenario["customers"], max_seconds, record)
+    wall_seconds = time.perf_counter() - start
+    return {
+        "wall_seconds": wall_seconds,
+        "evaluations": evaluations,
+        "evaluations_per_second": evaluations / wall_seconds,
+        "peak_rss_mb": _peak_rss_mb(),
+        "baseline_rss_mb": baseline_rss_mb,
+        "total_distance": quality[-1][1],
+        "total_waiting_time": quality[-1][2],
+        # Rows of (seconds since the start, total distance, total waiting time)
+        "quality": quality,
+    }
+
+
+def _parse_size(size: str) -> tuple[int, int]:
+    num_vehicles, num_customers = size.lower().split("x")
+    return int(num_vehicles), int(num_customers)
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=Path(__file__).parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _summary(result: dict) -> str:
+    summary = (
+        f"{result['num_vehicles']:>6} x {result['num_customers']:<7} "
+        f"{result['algorithm']:<15} {result['status']}"
+    )
+    if result["status"] == "ok":
+        summary += (
+            f" {result['wall_seconds']:.3f}s"
+            f" {result['evaluations_per_second']:.1f} evals/s"
+            f" {result['peak_rss_mb']:.0f} MB"
+            f" distance {result['total_distance']:.1f}"
+        )
+    elif "error" in result:
+        summary += f" {result['error']}"
+    return summary
+
+
+def benchmark(
+    sizes, algorithms, seed: int = 0, max_seconds: float = 10.0, verbose: bool = True
+) -> dict:
+    """Run the benchmark and return its results, see the module docstring."""
+    results = []
+    for num_vehicles, num_customers in sizes:
+        for algorithm in algorithms:
+            result = {
+                "algorithm": algorithm,
+                "num_vehicles": num_vehicles,
+                "num_customers": num_customers,
+            }
+            _, uses_tables = ALGORITHMS[algorithm]
+            if uses_tables and num_vehicles * num_customers > MAX_TABLE_ENTRIES:
+                result["status"] = "skipped"
+            else:
+                with ProcessPoolExecutor(1, mp_context=get_context("spawn")) as pool:
+                    try:
+                        result.update(
+                            pool.submit(
+                                _run,
+                                algorithm,
+                                num_vehicles,
+                                num_customers,
+                                seed,
+                                max_seconds,
+                            ).result()
+                        )
+                        result["status"] = "ok"
+                    except Exception as error:
+                        result["status"] = "failed"
+                        result["error"] = f"{type(error).__name__}: {error}"
+            if verbose:
+                print(_summary(result))
+            results.append(result)
+
+    return {
+        "commit": _git_commit(),
+        "created_at": time.time(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "seed": seed,
+        "max_seconds": max_seconds,
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        nargs="+",
+        type=_parse_size,
+        default=SIZES,
+        help="scenario sizes as VEHICLESxCUSTOMERS, e.g. 10x50",
+    )
+    parser.add_argument(
+        "--algorithms", nargs="+", choices=list(ALGORITHMS), default=list(ALGORITHMS)
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--max-seconds",
+        type=float,
+        default=10.0,
+        help="time budget of the genetic algorithms",
+    )
+    parser.add_argument("-o", "--output", default="benchmark.json")
+    args = parser.parse_args()
+
+    report = benchmark(args.sizes, args.algorithms, args.seed, args.max_seconds)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print("Results written to", args.output)
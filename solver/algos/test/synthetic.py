@@ -0,0 +1,92 @@
+"""Generate synthetic scenarios in the Munich area."""
+
+import uuid
+
+import numpy as np
+
+# Bounding box of the scenarios, in degrees of latitude and longitude.
+MUNICH_LATITUDE = (48.10, 48.18)
+MUNICH_LONGITUDE = (11.48, 11.66)
+
+# Places where customers cluster: Marienplatz, the main station, Schwabing,
+# Sendlinger Tor and Ostbahnhof.
+HOTSPOTS = np.array(
+    [
+        (48.1374, 11.5755),
+        (48.1402, 11.5600),
+        (48.1606, 11.5860),
+        (48.1339, 11.5668),
+        (48.1270, 11.6050),
+    ]
+)
+# Fraction of the customers around the hotspots, and their spread in degrees.
+HOTSPOT_FRACTION = 0.5
+HOTSPOT_SPREAD = 0.008
+
+# Mean trip length of the customers, in degrees.
+MEAN_TRIP = 0.03
+
+
+def _uniform(rng: np.random.Generator, n: int) -> np.ndarray:
+    return np.column_stack(
+        (rng.uniform(*MUNICH_LATITUDE, size=n), rng.uniform(*MUNICH_LONGITUDE, size=n))
+    )
+
+
+def _clip(coords: np.ndarray) -> np.ndarray:
+    return np.column_stack(
+        (
+            np.clip(coords[:, 0], *MUNICH_LATITUDE),
+            np.clip(coords[:, 1], *MUNICH_LONGITUDE),
+        )
+    )
+
+
+def _ids(rng: np.random.Generator, n: int) -> list[str]:
+    return [str(uuid.UUID(bytes=rng.bytes(16), version=4)) for _ in range(n)]
+
+
+def munich_scenario(num_vehicles: int, num_customers: int, seed: int = 0) -> dict:
+    """Generate a scenario in the format of the JSON files in test/data.
+
+    The vehicles are spread uniformly over the city. Half of the customers are
+    picked up around a few hotspots, the rest anywhere, and their destinations
+    are a random trip away. The same seed always gives the same scenario.
+    """
+    rng = np.random.default_rng(seed)
+    vehicle_coords = _uniform(rng, num_vehicles)
+
+    n_hotspot = round(num_customers * HOTSPOT_FRACTION)
+    hotspots = HOTSPOTS[rng.integers(0, len(HOTSPOTS), size=n_hotspot)]
+    origins = _clip(
+        np.concatenate(
+            (
+                hotspots + rng.normal(0.0, HOTSPOT_SPREAD, size=hotspots.shape),
+                _uniform(rng, num_customers - n_hotspot),
+            )
+        )
+    )
+    angles = rng.uniform(0.0, 2 * np.pi, size=num_customers)
+    lengths = rng.exponential(MEAN_TRIP, size=num_customers)
+    destinations = _clip(
+        origins
+        + lengths[:, np.newaxis] * np.column_stack((np.sin(angles), np.cos(angles)))
+    )
+
+    vehicles = [
+        {"id": vehicle_id, "coordX": x, "coordY": y}
+        for vehicle_id, (x, y) in zip(_ids(rng, num_vehicles), vehicle_coords.tolist())
+    ]
+    customers = [
+        {
+            "id": customer_id,
+            "coordX": x,
+            "coordY": y,
+            "destinationX": destination_x,
+            "destinationY": destination_y,
+        }
+        for customer_id, (x, y), (destination_x, destination_y) in zip(
+            _ids(rng, num_customers), origins.tolist(), destinations.tolist()
+        )
+    ]
+    return {"vehicles": vehicles, "customers": customers}
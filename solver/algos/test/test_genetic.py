@@ -15,7 +15,7 @@ if __name__ == "__main__":
     ) as f:
         loaded_scenario = json.load(f)
     solution = genetic_sol.solve(
-        loaded_scenario["vehicles"], loaded_scenario["customers"]
+        loaded_scenario["vehicles"], loaded_scenario["customers"], verbose=True
     )
     print("Number of vehicles:", len(loaded_scenario["vehicles"]))
     print("Number of customers:", len(loaded_scenario["customers"]))
@@ -0,0 +1,23 @@
+"""Test the greedy algorithm."""
+
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from greedy import solution as greedy_sol
+
+SCENARIO_NUMBER: int = 3
+
+if __name__ == "__main__":
+    with open(
+        Path(f"{Path(__file__).parent}/data/scenario_{SCENARIO_NUMBER:>02}.json"), "r"
+    ) as f:
+        loaded_scenario = json.load(f)
+    solution, (total_distance, total_waiting_time) = greedy_sol.solve(
+        loaded_scenario["vehicles"], loaded_scenario["customers"]
+    )
+    print("Number of vehicles:", len(loaded_scenario["vehicles"]))
+    print("Number of customers:", len(loaded_scenario["customers"]))
+    print("Total distance:", total_distance)
+    print("Total waiting time:", total_waiting_time)
@@ -1,27 +1,435 @@
-from flask import Flask, jsonify, request
+import gzip
+import json
+import os
+import threading
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
+from flask import Flask, jsonify, make_response, request
+
+import batch
+import wire
 from algos import solver
+from algos.distance_cache import DistanceCache
+from algos.genetic.parallel import process_context
+from cache import ResultCache, scenario_key
+from jobs import Job, JobManager, JobQueueFull
 
 app = Flask(__name__)
 
+# Cache of the distance tables on disk, if a directory is set.
+distance_cache = None
+if os.environ.get("SOLVER_DISTANCE_CACHE_DIR"):
+    distance_cache = DistanceCache(
+        os.environ["SOLVER_DISTANCE_CACHE_DIR"],
+        max_bytes=int(os.environ.get("SOLVER_DISTANCE_CACHE_MAX_MB", 1024)) * 2**20,
+    )
+
+# Set up the solvers once, instead of on every request.
+engine = solver.SolverEngine(distance_cache=distance_cache)
+
+# Cache of the responses, in memory and, if a directory is set, on disk.
+result_cache = ResultCache(
+    max_bytes=int(os.environ.get("SOLVER_CACHE_MAX_MB", 64)) * 2**20,
+    directory=os.environ.get("SOLVER_CACHE_DIR"),
+    max_disk_bytes=int(os.environ.get("SOLVER_CACHE_MAX_DISK_MB", 1024)) * 2**20,
+)
+
+
+def _solve(
+    key,
+    vehicles,
+    customers,
+    params,
+    progress_params,
+    columnar,
+    looked_up,
+    cancel_event,
+    progress,
+):
+    """Solve a scenario, or take its response from the cache, under ``key``.
+
+    Returns the serialized response, in the columnar format if ``columnar`` and
+    in JSON otherwise, and whether it was a cache "HIT" or "MISS". If the request
+    was ``looked_up`` in the cache already, and counted as a miss, the cache is
+    checked again without counting it twice.
+    """
+    # Identical scenarios get the response of the first solve, even if they
+    # were queued while it ran
+    body = result_cache.peek(key) if looked_up else result_cache.get(key)
+    if body is not None:
+        return body, "HIT"
+
+    # Call the solver function
+    solution = engine.solve(
+        vehicles,
+        customers,
+        cancel_event=cancel_event,
+        # The greedy and genetic allocations are kept side by side.
+        progress=lambda update: progress(update, update["algorithm"]),
+        **params,
+        **progress_params,
+    )
+    if columnar:
+        body = wire.encode_solution(solution, vehicles, customers)
+    else:
+        body = app.json.dumps(solution).encode()
+    # The solution of a cancelled run is discarded, so it is not cached either.
+    if not cancel_event.is_set():
+        result_cache.put(key, body)
+    return body, "MISS"
+
+
+# Seconds between comments sent on idle event streams.
+KEEP_ALIVE_SECONDS = 15
+
+# Default time budget of the genetic algorithm when re-solving a scenario.
+RESOLVE_MAX_SECONDS = 0.5
+
+# Solves run in the background, a few at a time.
+jobs = JobManager(
+    _solve,
+    max_workers=int(os.environ.get("SOLVER_MAX_WORKERS", 4)),
+    max_queued=int(os.environ.get("SOLVER_MAX_QUEUED", 16)),
+    max_finished=int(os.environ.get("SOLVER_MAX_FINISHED_JOBS", 1000)),
+)
+
+
+# Scenarios of /solve_batch are solved on a pool of processes, one per core by
+# default, which is created with the first batch. The processes are not forked
+# from the service, whose other threads may hold locks at that moment.
+_batch_pool = None
+_batch_pool_lock = threading.Lock()
+
+
+def _solve_params(data: dict, default_max_seconds: float | None = None) -> dict:
+    # Optional limits on the duration of the genetic algorithm
+    return {
+        "max_seconds": data.get("max_seconds", default_max_seconds),
+        "stagnation_generations": data.get("stagnation_generations"),
+        "stagnation_epsilon": data.get("stagnation_epsilon", 0.0),
+        "include_history": data.get("include_history", False),
+        # Number of random allocations sampled for the baseline, if any
+        "random_samples": data.get("random_samples"),
+        # Number of clusters solved separately, for large scenarios
+        "n_clusters": data.get("n_clusters"),
+        # Time spent in each phase of the genetic algorithm
+        "profile": data.get("profile", False),
+    }
+
+
+def _job_args(
+    data: dict,
+    initial_allocation: dict | None = None,
+    default_max_seconds: float | None = None,
+    columnar: bool = False,
+) -> tuple:
+    """Return the arguments of _solve() for a request, up to ``columnar``."""
+    # Extract vehicles and customers from the request
+    vehicles = data.get("vehicles", [])
+    customers = data.get("customers", [])
+
+    params = _solve_params(data, default_max_seconds)
+    # Allocation the genetic algorithm is warm-started from, if any
+    if initial_allocation is not None:
+        params["initial_allocation"] = initial_allocation
+
+    # How often the best allocation so far is published while solving, by
+    # default every half second
+    progress_generations = data.get("progress_generations")
+    progress_ms = data.get("progress_ms", 500 if progress_generations is None else None)
+    progress_params = {
+        "progress_generations": progress_generations,
+        "progress_seconds": progress_ms / 1000 if progress_ms is not None else None,
+    }
+    key = scenario_key(vehicles, customers, {**params, "columnar": columnar})
+    return key, vehicles, customers, params, progress_params, columnar
+
+
+def _submit_job(data: dict) -> Job:
+    return jobs.submit(*_job_args(data), False)
+
+
+@app.errorhandler(JobQueueFull)
+def job_queue_full(error):
+    return jsonify({"error": str(error)}), 503
+
+
+@app.errorhandler(wire.WireFormatError)
+def wire_format_error(error):
+    return jsonify({"error": str(error)}), 400
+
 
 @app.route("/")
 def hello_world():
     return "Fast and Neat Robotaxi Commissioning API"
 
 
+def _wait_for_job(job: Job, mimetype: str = "application/json"):
+    job.wait()
+    if job.status == Job.CANCELLED:
+        return make_response(jsonify(job.to_dict()), 409)
+    if job.status == Job.FAILED:
+        return make_response(jsonify(job.to_dict()), 500)
+
+    body, cache_status = job.result
+    response = app.response_class(body, mimetype=mimetype)
+    response.headers["X-Cache"] = cache_status
+    return response
+
+
+def _solve_and_wait(
+    data: dict,
+    initial_allocation: dict | None = None,
+    default_max_seconds: float | None = None,
+    columnar: bool = False,
+):
+    """Answer a request from the cache, or solve it as a job and wait for it.
+
+    Cache hits are answered right away, without waiting in the job queue. The
+    job is forgotten once answered, as nobody else knows its id.
+    """
+    args = _job_args(data, initial_allocation, default_max_seconds, columnar)
+    mimetype = wire.CONTENT_TYPE if columnar else "application/json"
+    body = result_cache.get(args[0])
+    if body is not None:
+        response = app.response_class(body, mimetype=mimetype)
+        response.headers["X-Cache"] = "HIT"
+        return response
+
+    job = jobs.submit(*args, True)
+    try:
+        return _wait_for_job(job, mimetype)
+    finally:
+        jobs.forget(job.id)
+
+
 @app.route("/solve", methods=["POST"])
 def solve():
+    """Solve a scenario, sent in JSON or in the columnar format of wire.py.
+
+    The response is in the format of the request, selected by its Content-Type.
+    The columnar body may be gzip-compressed, with a Content-Encoding header;
+    the columnar response is compressed if the Accept-Encoding allows it.
+    """
+    if request.mimetype != wire.CONTENT_TYPE:
+        # Run the solve as a job and wait for it.
+        return _solve_and_wait(request.get_json())
+
+    body = request.get_data()
+    if request.content_encoding == "gzip":
+        try:
+            body = gzip.decompress(body)
+        except (OSError, EOFError, zlib.error) as error:
+            return jsonify({"error": f"invalid gzip body: {error}"}), 400
+    response = _solve_and_wait(wire.decode_request(body), columnar=True)
+    if response.status_code == 200 and "gzip" in request.accept_encodings:
+        response.set_data(gzip.compress(response.get_data(), compresslevel=1))
+        response.headers["Content-Encoding"] = "gzip"
+    return response
+
+
+@app.route("/resolve", methods=["POST"])
+def resolve():
+    """Re-solve a scenario that changed, starting from its previous allocation.
+
+    The request has the current ``vehicles``, the ``customers`` of the previous
+    solve and its ``allocation``, in the format of the response, and optionally
+    the ``added_customers`` and the ids of the ``removed_customers``. Unless
+    ``max_seconds`` is given, the genetic algorithm runs for
+    RESOLVE_MAX_SECONDS.
+    """
     data = request.get_json()
+    removed_customers = set(data.get("removed_customers", []))
+    customers = [
+        customer
+        for customer in data.get("customers", [])
+        if customer["id"] not in removed_customers
+    ] + data.get("added_customers", [])
+    return _solve_and_wait(
+        {**data, "customers": customers},
+        initial_allocation=data.get("allocation", {}),
+        default_max_seconds=RESOLVE_MAX_SECONDS,
+    )
 
-    # Extract vehicles and customers from the request
-    vehicles = data.get("vehicles", [])
-    customers = data.get("customers", [])
 
-    # Call the solver function
-    solution = solver.solve(vehicles, customers)
+def _batch_pool_executor() -> ProcessPoolExecutor:
+    global _batch_pool
+    with _batch_pool_lock:
+        if _batch_pool is None:
+            _batch_pool = ProcessPoolExecutor(
+                int(os.environ.get("SOLVER_BATCH_WORKERS", os.cpu_count() or 1)),
+                mp_context=process_context(),
+                initializer=batch.init_worker,
+                initargs=(distance_cache,),
+            )
+        return _batch_pool
+
+
+def _json_line(content: dict) -> str:
+    return app.json.dumps(content) + "\n"
+
+
+@app.route("/solve_batch", methods=["POST"])
+def solve_batch():
+    """Solve many scenarios in parallel, on a pool of processes.
+
+    The request has a list of ``scenarios``, each like the request of /solve; its
+    other fields are the defaults of all the scenarios. The response is
+    newline-delimited JSON, with one line per scenario as soon as it is solved:
+    its ``index`` in the list, its ``status``, and its ``result`` and whether it
+    was a cache "HIT" or "MISS", or the ``error`` if it failed.
+    """
+    data = request.get_json()
+    scenarios = data.get("scenarios") if isinstance(data, dict) else None
+    if not isinstance(scenarios, list) or not all(
+        isinstance(scenario, dict) for scenario in scenarios
+    ):
+        return jsonify({"error": "scenarios must be a list of scenarios."}), 400
+    defaults = {key: value for key, value in data.items() if key != "scenarios"}
+    pool = _batch_pool_executor()
+
+    def results():
+        futures, cached = {}, []
+        try:
+            # Start all the solves before streaming anything.
+            for index, scenario in enumerate(scenarios):
+                scenario = {**defaults, **scenario}
+                vehicles = scenario.get("vehicles", [])
+                customers = scenario.get("customers", [])
+                params = _solve_params(scenario)
+                # Same cache entries as /solve
+                key = scenario_key(vehicles, customers, {**params, "columnar": False})
+                body = result_cache.get(key)
+                if body is None:
+                    future = pool.submit(batch.solve, vehicles, customers, params)
+                    futures[future] = index, key
+                else:
+                    cached.append((index, body))
+
+            for index, body in cached:
+                yield _json_line(
+                    {
+                        "index": index,
+                        "status": Job.DONE,
+                        "cache": "HIT",
+                        "result": app.json.loads(body),
+                    }
+                )
+            for future in as_completed(futures):
+                index, key = futures[future]
+                try:
+                    solution = future.result()
+                except Exception as error:
+                    yield _json_line(
+                        {
+                            "index": index,
+                            "status": Job.FAILED,
+                            "error": f"{type(error).__name__}: {error}",
+                        }
+                    )
+                    continue
+                result_cache.put(key, app.json.dumps(solution).encode())
+                yield _json_line(
+                    {
+                        "index": index,
+                        "status": Job.DONE,
+                        "cache": "MISS",
+                        "result": solution,
+                    }
+                )
+        finally:
+            # The scenarios which have not started yet are dropped if the client
+            # goes away.
+            for future in futures:
+                future.cancel()
+
+    return app.response_class(results(), mimetype="application/x-ndjson")
+
+
+@app.route("/jobs", methods=["POST"])
+def submit_job():
+    job = _submit_job(request.get_json())
+    response = jsonify(job.to_dict())
+    response.status_code = 202
+    response.headers["Location"] = f"/jobs/{job.id}"
+    return response
+
+
+def _job_response(job: Job | None):
+    if job is None:
+        return jsonify({"error": "unknown job"}), 404
+    content = job.to_dict()
+    if job.status == Job.DONE:
+        body, _ = job.result
+        content["result"] = app.json.loads(body)
+    return jsonify(content)
+
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    return _job_response(jobs.get(job_id))
+
+
+@app.route("/jobs/<job_id>", methods=["DELETE"])
+def cancel_job(job_id):
+    return _job_response(jobs.cancel(job_id))
+
+
+def _server_sent_event(event: str, data: str) -> str:
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+@app.route("/jobs/<job_id>/events", methods=["GET"])
+def job_events(job_id):
+    """Stream the progress of a job as server-sent events.
+
+    A "progress" event carries the greedy allocation, and then the best allocation
+    of the genetic algorithm every ``progress_generations`` generations or
+    ``progress_ms`` milliseconds, if it changed, even while it is worse than the
+    greedy one. Each event has the stats of the allocation, the algorithm that
+    found it and the generation. A client connecting late receives the latest
+    allocation of each algorithm. The stream ends with a "result"
+    event with the response of the solve, or with a "failed" or "cancelled"
+    event with the job status.
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "unknown job"}), 404
+
+    def events():
+        version = 0
+        while True:
+            changed = job.wait_for_change(version, timeout=KEEP_ALIVE_SECONDS)
+            if job.progress_version > version:
+                updates = job.progress_since(version)
+                version = job.progress_version
+                for update in updates:
+                    yield _server_sent_event("progress", json.dumps(update))
+            if job.finished:
+                break
+            if not changed:
+                # Keep the connection from timing out while nothing happens.
+                yield ": keep-alive\n\n"
+        if job.status == Job.DONE:
+            body, _ = job.result
+            yield _server_sent_event("result", body.decode())
+        else:
+            yield _server_sent_event(job.status, json.dumps(job.to_dict()))
+
+    return app.response_class(
+        events(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 
-    return jsonify(solution)
+@app.route("/cache", methods=["GET"])
+def cache_stats():
+    stats = result_cache.stats()
+    if distance_cache is not None:
+        stats["distances"] = distance_cache.stats()
+    return jsonify(stats)
 
 
 if __name__ == "__main__":
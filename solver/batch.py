@@ -0,0 +1,21 @@
+"""Worker processes of the batch solves.
+
+Each process of the pool sets up its own SolverEngine once, as the app does, and
+then solves whole scenarios, so a batch uses all the cores.
+"""
+
+from algos import solver
+from algos.distance_cache import DistanceCache
+
+_engine: solver.SolverEngine | None = None
+
+
+def init_worker(distance_cache: DistanceCache | None = None) -> None:
+    """Set up the solvers of a worker process."""
+    global _engine
+    _engine = solver.SolverEngine(distance_cache=distance_cache)
+
+
+def solve(vehicles: list[dict], customers: list[dict], params: dict) -> dict:
+    """Solve a scenario in a worker process, see SolverEngine.solve()."""
+    return _engine.solve(vehicles, customers, **params)
@@ -0,0 +1,149 @@
+"""Cache of solver responses, keyed by the content of the scenario."""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from algos.cache_files import evict, write_file
+
+
+def _hash_items(hasher, items: list[dict], fields: tuple[str, ...]) -> None:
+    columns = getattr(items, "columns", None)
+    if columns is not None:
+        # Records from the columnar format: hash the columns as they are.
+        hasher.update("\n".join(items.ids).encode())
+        for field in fields:
+            hasher.update(columns[field].astype("<f8").tobytes())
+        return
+    content = [(item["id"], *(item[field] for field in fields)) for item in items]
+    hasher.update(json.dumps(content, separators=(",", ":")).encode())
+
+
+def scenario_key(vehicles: list[dict], customers: list[dict], params: dict) -> str:
+    """Hash the ids and coordinates of a scenario, and the solver parameters.
+
+    Fields the solvers do not read do not change the key.
+    """
+    hasher = hashlib.sha256()
+    _hash_items(hasher, vehicles, ("coordX", "coordY"))
+    _hash_items(hasher, customers, ("coordX", "coordY", "destinationX", "destinationY"))
+    hasher.update(json.dumps(params, sort_keys=True, separators=(",", ":")).encode())
+    return hasher.hexdigest()
+
+
+class ResultCache:
+    """LRU cache of serialized responses, optionally backed by a directory.
+
+    Entries are evicted, least recently used first, once they take more than
+    ``max_bytes`` in memory. With a ``directory``, entries are also written to
+    disk, so they survive restarts and evictions, and the files are deleted,
+    least recently used first, once they take more than ``max_disk_bytes``.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        directory: str | Path | None = None,
+        max_disk_bytes: int | None = None,
+    ):
+        self.max_bytes = max_bytes
+        self.directory = Path(directory) if directory is not None else None
+        self.max_disk_bytes = max_disk_bytes
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> bytes | None:
+        value, source = self._lookup(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.disk_hits += source == "disk"
+        return value
+
+    def peek(self, key: str) -> bytes | None:
+        """Like get(), but without counting a hit or a miss.
+
+        For a second lookup of the same request, e.g., once it waited in a queue.
+        """
+        value, _ = self._lookup(key)
+        return value
+
+    def _lookup(self, key: str) -> tuple[bytes | None, str | None]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                return value, "memory"
+        # The files are read outside the lock, which only guards the entries:
+        # a slow disk does not hold up the lookups of other threads.
+        value = self._read(key)
+        if value is None:
+            return None, None
+        with self._lock:
+            self._insert(key, value)
+        return value, "disk"
+
+    def put(self, key: str, value: bytes) -> None:
+        with self._lock:
+            self._insert(key, value)
+        # The files are replaced atomically, so concurrent writes need no lock.
+        self._write(key, value)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+            }
+
+    def _insert(self, key: str, value: bytes) -> None:
+        if key in self._entries:
+            self._size -= len(self._entries.pop(key))
+        if len(value) > self.max_bytes:
+            return
+        self._entries[key] = value
+        self._size += len(value)
+        while self._size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def _read(self, key: str) -> bytes | None:
+        if self.directory is None:
+            return None
+        path = self._path(key)
+        try:
+            value = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        try:
+            # The modification time orders the files for the eviction.
+            os.utime(path)
+        except FileNotFoundError:
+            # Evicted by another thread since it was read.
+            pass
+        return value
+
+    def _write(self, key: str, value: bytes) -> None:
+        if self.directory is None:
+            return
+        write_file(self._path(key), lambda file: file.write(value))
+        if self.max_disk_bytes is not None:
+            evict(self.directory, "*.json", self.max_disk_bytes)
@@ -0,0 +1,192 @@
+"""Background jobs of the solver service."""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class JobQueueFull(Exception):
+    """Raised when a job is submitted while too many are queued or running."""
+
+
+class Job:
+    """A call running in the background, which can be cancelled.
+
+    ``result`` is whatever the call returned, once ``status`` is ``DONE``. While
+    it runs, the call can publish() its progress; the latest one of each topic
+    is kept.
+    """
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.status = Job.QUEUED
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+        self.future = None
+        self.progress_version = 0
+        self._progress = {}
+        self._changed = threading.Condition()
+        self._finished = threading.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self._finished.is_set()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Wait until the job has finished; returns whether it did."""
+        return self._finished.wait(timeout)
+
+    def publish(self, progress, topic=None) -> None:
+        """Replace the progress of the job on ``topic``, waking up wait_for_change().
+
+        The progress on the other topics is kept, e.g., the greedy allocation of a
+        solve while the genetic algorithm reports its own, worse ones.
+        """
+        with self._changed:
+            self.progress_version += 1
+            self._progress[topic] = (self.progress_version, progress)
+            self._changed.notify_all()
+
+    def progress_since(self, version: int) -> list:
+        """Return the progress published after ``version``, oldest first.
+
+        Only the latest progress of each topic is returned.
+        """
+        with self._changed:
+            updates = sorted(
+                update for update in self._progress.values() if update[0] > version
+            )
+        return [progress for _, progress in updates]
+
+    def wait_for_change(self, version: int, timeout: float | None = None) -> bool:
+        """Wait until the progress is newer than ``version``, or the job finished.
+
+        Returns whether that happened before the timeout.
+        """
+        with self._changed:
+            return self._changed.wait_for(
+                lambda: self.progress_version > version or self.finished, timeout
+            )
+
+    def to_dict(self) -> dict:
+        job = {
+            "id": self.id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if self.error is not None:
+            job["error"] = self.error
+        return job
+
+    def _finish(self, status: str) -> None:
+        self.status = status
+        self.finished_at = time.time()
+        with self._changed:
+            self._finished.set()
+            self._changed.notify_all()
+
+
+class JobManager:
+    """Run jobs on a bounded pool of threads.
+
+    ``run`` is called with the arguments of each job and two keyword arguments:
+    ``cancel_event``, which is set when the job is cancelled while running, and
+    ``progress``, the Job.publish() method of the job. At most ``max_workers``
+    jobs run at once, and ``max_queued`` more wait for a thread; further
+    submissions raise JobQueueFull. Only the ``max_finished`` most recent
+    finished jobs are kept.
+    """
+
+    def __init__(self, run, max_workers: int, max_queued: int, max_finished: int):
+        self._run = run
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.max_finished = max_finished
+        self._executor = ThreadPoolExecutor(
+            max_workers, thread_name_prefix="solver-job"
+        )
+        self._jobs: OrderedDict[str, Job] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, *args) -> Job:
+        job = Job()
+        with self._lock:
+            pending = sum(not j.finished for j in self._jobs.values())
+            if pending >= self.max_workers + self.max_queued:
+                raise JobQueueFull(f"{pending} jobs are already queued or running.")
+            self._jobs[job.id] = job
+            self._forget_finished()
+            job.future = self._executor.submit(self._execute, job, args)
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Job | None:
+        """Cancel a job, if it has not finished yet.
+
+        A queued job never starts. A running job finishes as soon as the call
+        notices its ``cancel_event``, and its result is discarded.
+        """
+        job = self.get(job_id)
+        if job is None or job.finished:
+            return job
+        job.cancel_event.set()
+        if job.future.cancel():
+            job._finish(Job.CANCELLED)
+        return job
+
+    def forget(self, job_id: str) -> None:
+        """Drop a finished job, e.g., once its result has been sent."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job.finished:
+                del self._jobs[job_id]
+
+    def shutdown(self) -> None:
+        """Cancel all the jobs and wait for the running ones to finish."""
+        with self._lock:
+            job_ids = list(self._jobs)
+        for job_id in job_ids:
+            self.cancel(job_id)
+        self._executor.shutdown(wait=True)
+
+    def _execute(self, job: Job, args: tuple) -> None:
+        if job.cancel_event.is_set():
+            job._finish(Job.CANCELLED)
+            return
+        job.status = Job.RUNNING
+        job.started_at = time.time()
+        try:
+            result = self._run(
+                *args, cancel_event=job.cancel_event, progress=job.publish
+            )
+        except Exception as error:
+            job.error = f"{type(error).__name__}: {error}"
+            job._finish(Job.FAILED)
+            return
+        if job.cancel_event.is_set():
+            job._finish(Job.CANCELLED)
+        else:
+            job.result = result
+            job._finish(Job.DONE)
+
+    def _forget_finished(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[: max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
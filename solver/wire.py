@@ -0,0 +1,207 @@
+"""Columnar binary format of the /solve requests and responses.
+
+A frame is made of the MAGIC bytes, the length of the header as a little-endian
+uint32, the header in UTF-8 JSON, and the columns listed in the header as
+``[name, dtype, nbytes]``. Each column starts at a multiple of 8 bytes from the
+start of the frame, so the numeric ones, in little-endian ``"<f8"`` or
+``"<i4"``, are read into NumPy without copies. A ``"utf-8"`` column holds
+strings separated by newlines.
+
+In a request, the header holds the parameters of the JSON request, and the
+columns the ids and coordinates of the vehicles and customers, e.g.,
+``vehicles.id`` and ``customers.destinationX``. A response is the JSON response
+in the header, where each allocation is replaced with the names of two
+``"<i4"`` columns: the (0-based) indices of the vehicles and customers, in the
+order of the request, of each pair of the allocation.
+"""
+
+import json
+import struct
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent / "algos"))
+from models import Records, ids
+
+CONTENT_TYPE = "application/vnd.robotaxi.columnar"
+MAGIC = b"RTC1"
+ALIGNMENT = 8
+
+# Types of the columns a frame may hold.
+DTYPES = ("<f8", "<i4", "utf-8")
+
+# Columns of the vehicles and customers in a request, besides their ids.
+VEHICLE_COLUMNS = ("coordX", "coordY")
+CUSTOMER_COLUMNS = ("coordX", "coordY", "destinationX", "destinationY")
+
+
+class WireFormatError(ValueError):
+    """Raised when a frame is malformed."""
+
+
+def _padding(offset: int) -> bytes:
+    return b"\0" * (-offset % ALIGNMENT)
+
+
+def encode(header: dict, columns: dict[str, np.ndarray | list[str]]) -> bytes:
+    """Encode a header and named columns, arrays or lists of strings, in a frame."""
+    buffers, specs = [], []
+    for name, column in columns.items():
+        if isinstance(column, np.ndarray):
+            dtype = column.dtype.newbyteorder("<").str
+            data = column.astype(dtype, copy=False).tobytes()
+        else:
+            if any("\n" in string for string in column):
+                raise WireFormatError(f"the strings of {name!r} contain newlines.")
+            dtype = "utf-8"
+            data = "\n".join(column).encode()
+        buffers.append(data)
+        specs.append([name, dtype, len(data)])
+
+    header_bytes = json.dumps({**header, "columns": specs}).encode()
+    frame = [MAGIC, struct.pack("<I", len(header_bytes)), header_bytes]
+    offset = len(MAGIC) + 4 + len(header_bytes)
+    for data in buffers:
+        frame += [_padding(offset), data]
+        offset += len(_padding(offset)) + len(data)
+    return b"".join(frame)
+
+
+def decode(body: bytes) -> tuple[dict, dict[str, np.ndarray | list[str]]]:
+    """Decode a frame into its header and columns.
+
+    The numeric columns are read-only views of ``body``.
+    """
+    if body[: len(MAGIC)] != MAGIC:
+        raise WireFormatError("not a columnar frame.")
+    try:
+        (header_length,) = struct.unpack_from("<I", body, len(MAGIC))
+        offset = len(MAGIC) + 4 + header_length
+        header = json.loads(body[len(MAGIC) + 4 : offset])
+        specs = header.pop("columns")
+        specs = [(str(name), dtype, nbytes) for name, dtype, nbytes in specs]
+    except (struct.error, ValueError, KeyError, TypeError, AttributeError) as error:
+        raise WireFormatError(f"invalid header: {error}") from error
+
+    columns = {}
+    for name, dtype, nbytes in specs:
+        if dtype not in DTYPES:
+            raise WireFormatError(f"column {name!r} has an invalid type {dtype!r}.")
+        if not isinstance(nbytes, int) or nbytes < 0:
+            raise WireFormatError(f"column {name!r} has an invalid size {nbytes!r}.")
+        offset += -offset % ALIGNMENT
+        if offset + nbytes > len(body):
+            raise WireFormatError(f"column {name!r} is truncated.")
+        if dtype == "utf-8":
+            try:
+                text = body[offset : offset + nbytes].decode()
+            except UnicodeDecodeError as error:
+                raise WireFormatError(f"column {name!r}: {error}") from error
+            columns[name] = text.split("\n") if nbytes else []
+        else:
+            dtype = np.dtype(dtype)
+            if nbytes % dtype.itemsize:
+                raise WireFormatError(f"column {name!r} has a partial value.")
+            columns[name] = np.frombuffer(body, dtype, nbytes // dtype.itemsize, offset)
+        offset += nbytes
+    return header, columns
+
+
+def _records(columns: dict, prefix: str, names: tuple[str, ...]) -> Records:
+    try:
+        records = Records(
+            columns[f"{prefix}.id"],
+            {name: columns[f"{prefix}.{name}"] for name in names},
+        )
+    except KeyError as error:
+        raise WireFormatError(f"missing column {error}") from error
+    if not isinstance(records.ids, list):
+        raise WireFormatError(f"the column {prefix}.id must be of utf-8 strings.")
+    for name, column in records.columns.items():
+        if not isinstance(column, np.ndarray) or column.dtype != np.float64:
+            raise WireFormatError(f"the column {prefix}.{name} must be of <f8.")
+        if len(column) != len(records):
+            raise WireFormatError(
+                f"the column {prefix}.{name} has {len(column)} rows instead of "
+                f"{len(records)}."
+            )
+    return records
+
+
+def encode_request(vehicles: list[dict], customers: list[dict], **params) -> bytes:
+    """Encode a request of the vehicles and customers, with the given parameters."""
+    columns = {"vehicles.id": ids(vehicles)}
+    for name in VEHICLE_COLUMNS:
+        columns[f"vehicles.{name}"] = np.array([v[name] for v in vehicles], "<f8")
+    columns["customers.id"] = ids(customers)
+    for name in CUSTOMER_COLUMNS:
+        columns[f"customers.{name}"] = np.array([c[name] for c in customers], "<f8")
+    return encode(params, columns)
+
+
+def decode_request(body: bytes) -> dict:
+    """Decode a request into the same dictionary as its JSON counterpart.
+
+    The vehicles and customers are Records backed by the columns of the frame.
+    """
+    header, columns = decode(body)
+    return {
+        **header,
+        "vehicles": _records(columns, "vehicles", VEHICLE_COLUMNS),
+        "customers": _records(columns, "customers", CUSTOMER_COLUMNS),
+    }
+
+
+def encode_solution(
+    solution: dict, vehicles: list[dict], customers: list[dict]
+) -> bytes:
+    """Encode a response of the solver, with the allocations as columns."""
+    vehicle_indices = {vehicle_id: i for i, vehicle_id in enumerate(ids(vehicles))}
+    customer_indices = {customer_id: i for i, customer_id in enumerate(ids(customers))}
+    header, columns = {}, {}
+    for key, entry in solution.items():
+        if not isinstance(entry, dict) or "allocation" not in entry:
+            header[key] = entry
+            continue
+        pairs = [
+            (vehicle_indices[vehicle_id], customer_indices[customer_id])
+            for vehicle_id, customer_ids in entry["allocation"].items()
+            for customer_id in customer_ids
+        ]
+        pairs = np.array(pairs, dtype="<i4").reshape(-1, 2)
+        columns[f"{key}.vehicles"] = pairs[:, 0]
+        columns[f"{key}.customers"] = pairs[:, 1]
+        header[key] = {
+            **entry,
+            "allocation": {
+                "vehicles": f"{key}.vehicles",
+                "customers": f"{key}.customers",
+            },
+        }
+    return encode(header, columns)
+
+
+def decode_solution(
+    body: bytes, vehicle_ids: list[str], customer_ids: list[str]
+) -> dict:
+    """Decode a response into the same dictionary as its JSON counterpart.
+
+    ``vehicle_ids`` and ``customer_ids`` are the ids, in the order of the request.
+    """
+    header, columns = decode(body)
+    for entry in header.values():
+        if not isinstance(entry, dict) or "allocation" not in entry:
+            continue
+        allocation = {}
+        pairs = zip(
+            columns[entry["allocation"]["vehicles"]].tolist(),
+            columns[entry["allocation"]["customers"]].tolist(),
+        )
+        for vehicle, customer in pairs:
+            allocation.setdefault(vehicle_ids[vehicle], []).append(
+                customer_ids[customer]
+            )
+        entry["allocation"] = allocation
+    return header